@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the hot paths of the compound fields.
+
+Runs each benchmark (or those whose names contain any of the given strings), reporting its
+operations per second, latency per item and peak memory. Results can be saved as a baseline, and
+compared against a saved baseline to flag regressions::
+
+    $ python benchmarks/run.py --save benchmarks/baseline.json
+    $ python benchmarks/run.py --compare benchmarks/baseline.json
+    $ python benchmarks/run.py partialdict
+
+"""
+
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure(SECRET_KEY='s3cr3t')
+
+import django  # noqa: E402
+django.setup()
+
+from rest_framework import serializers  # noqa: E402
+
+from drf_compound_fields.fields import ListOrItemField  # noqa: E402
+from drf_compound_fields.fields import PartialDictField  # noqa: E402
+
+
+class EmbeddedSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+BENCHMARKS = []
+
+
+def benchmark(items=1):
+    """
+    Register a benchmark, given as a function returning the operation to time. items is the number
+    of items processed by each operation, for reporting the latency per item.
+    """
+    def register(setup):
+        BENCHMARKS.append((setup.__name__, setup, items))
+        return setup
+    return register
+
+
+@benchmark()
+def listoritem_item_char():
+    field = ListOrItemField(child=serializers.CharField())
+    return lambda: field.run_validation('value')
+
+
+@benchmark(items=1000)
+def listoritem_list_char():
+    field = ListOrItemField(child=serializers.CharField())
+    data = ['value{0}'.format(i) for i in range(1000)]
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=10000)
+def listoritem_list_int():
+    field = ListOrItemField(child=serializers.IntegerField())
+    data = list(range(10000))
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=10000)
+def listoritem_list_int_batch():
+    field = ListOrItemField(child=serializers.IntegerField(), batch=True)
+    data = list(range(10000))
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=10000)
+def listoritem_list_char_repeated_memoize():
+    field = ListOrItemField(child=serializers.EmailField(), memoize=100)
+    data = ['user{0}@example.com'.format(i % 10) for i in range(10000)]
+    return lambda: field.run_validation(data)
+
+
+def _listoritem_list_serializer_malformed(precheck):
+    field = ListOrItemField(child=EmbeddedSerializer(), precheck=precheck)
+    data = [{'name': 'value', 'count': i} for i in range(999)] + [{'name': 'value'}]
+
+    def operation():
+        try:
+            field.run_validation(data)
+        except serializers.ValidationError:
+            pass
+    return operation
+
+
+@benchmark(items=1000)
+def listoritem_list_serializer_malformed():
+    return _listoritem_list_serializer_malformed(False)
+
+
+@benchmark(items=1000)
+def listoritem_list_serializer_malformed_precheck():
+    return _listoritem_list_serializer_malformed(True)
+
+
+def _listoritem_list_int_all_invalid(sparse_errors):
+    class ContainerSerializer(serializers.Serializer):
+        values = ListOrItemField(child=serializers.IntegerField(), sparse_errors=sparse_errors)
+
+    data = {'values': ['x'] * 10000}
+
+    def operation():
+        serializer = ContainerSerializer(data=data)
+        serializer.is_valid()
+        return serializer.errors
+    return operation
+
+
+@benchmark(items=10000)
+def listoritem_list_int_all_invalid():
+    return _listoritem_list_int_all_invalid(False)
+
+
+@benchmark(items=10000)
+def listoritem_list_int_all_invalid_sparse_errors():
+    return _listoritem_list_int_all_invalid(True)
+
+
+@benchmark(items=1000)
+def listoritem_list_serializer_columnar():
+    field = ListOrItemField(child=EmbeddedSerializer(), columnar=True)
+    data = [{'name': 'value', 'count': i} for i in range(1000)]
+    return lambda: field.run_validation(data)
+
+
+@benchmark()
+def listoritem_item_serializer():
+    field = ListOrItemField(child=EmbeddedSerializer())
+    return lambda: field.run_validation({'name': 'value', 'count': 1})
+
+
+@benchmark(items=1000)
+def listoritem_list_serializer():
+    field = ListOrItemField(child=EmbeddedSerializer())
+    data = [{'name': 'value', 'count': i} for i in range(1000)]
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=1000)
+def listoritem_list_serializer_representation():
+    field = ListOrItemField(child=EmbeddedSerializer())
+    obj = [{'name': 'value', 'count': i} for i in range(1000)]
+    return lambda: field.to_representation(obj)
+
+
+@benchmark(items=5000)
+def partialdict_wide_few_included():
+    field = PartialDictField(included_keys=['k1', 'k2', 'k3'], child=serializers.CharField())
+    data = dict(('k{0}'.format(i), str(i)) for i in range(5000))
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=5000)
+def partialdict_wide_representation():
+    field = PartialDictField(included_keys=['k1', 'k2', 'k3'], child=serializers.CharField())
+    obj = dict(('k{0}'.format(i), str(i)) for i in range(5000))
+    return lambda: field.to_representation(obj)
+
+
+def _partialdict_wide_representation_many_included(cached):
+    field = PartialDictField(included_keys=['k{0}'.format(i) for i in range(0, 5000, 10)],
+                             child=serializers.DateField(),
+                             cache_fingerprint=(
+                                 (lambda obj: (obj['id'], obj['version'])) if cached else None))
+    obj = dict(('k{0}'.format(i), datetime.date(2000, 1, 1)) for i in range(5000))
+    obj['id'] = 1
+    obj['version'] = 1
+    return lambda: field.to_representation(obj)
+
+
+@benchmark(items=5000)
+def partialdict_representation_500_included():
+    return _partialdict_wide_representation_many_included(False)
+
+
+@benchmark(items=5000)
+def partialdict_representation_500_included_cached():
+    return _partialdict_wide_representation_many_included(True)
+
+
+@benchmark(items=10000)
+def listoritem_list_char_representation_zero_copy():
+    field = ListOrItemField(child=serializers.CharField(), zero_copy=True)
+    obj = ['value{0}'.format(i) for i in range(10000)]
+    return lambda: field.to_representation(obj)
+
+
+@benchmark(items=1000)
+def partialdict_representation_zero_copy():
+    included_keys = ['k{0}'.format(i) for i in range(1000)]
+    field = PartialDictField(included_keys, child=serializers.CharField(), zero_copy=True)
+    obj = dict((key, key) for key in included_keys)
+    return lambda: field.to_representation(obj)
+
+
+@benchmark(items=5000)
+def partialdict_wide_patterns():
+    field = PartialDictField(included_keys=[], child=serializers.CharField(),
+                             included_patterns=['metric.*', re.compile('attr_[0-9]+')])
+    data = dict(('{0}{1}'.format(('metric.', 'attr_', 'other_')[i % 3], i), str(i))
+                for i in range(5000))
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=3)
+def partialdict_child_fields():
+    field = PartialDictField([], child={
+        'name': serializers.CharField(), 'count': serializers.IntegerField(),
+        'ratio': serializers.FloatField()})
+    return lambda: field.run_validation({'name': 'value', 'count': 1, 'ratio': 0.5, 'other': 0})
+
+
+@benchmark(items=3)
+def partialdict_child_fields_serializer():
+    class RatioSerializer(EmbeddedSerializer):
+        ratio = serializers.FloatField()
+
+    field = RatioSerializer()
+    return lambda: field.run_validation({'name': 'value', 'count': 1, 'ratio': 0.5, 'other': 0})
+
+
+def _partialdict_filter(included):
+    # Filtering alone, of a 1000 key dict, to show the crossover between probing the included keys
+    # and scanning the input.
+    field = PartialDictField(included_keys=['k{0}'.format(i) for i in range(0, included * 2, 2)],
+                             child=serializers.CharField())
+    data = dict(('k{0}'.format(i), str(i)) for i in range(1000))
+    return lambda: field._filter_dict(data)
+
+
+for _included in (10, 100, 500, 1000, 2000, 5000):
+    _setup = (lambda included: lambda: _partialdict_filter(included))(_included)
+    _setup.__name__ = 'partialdict_filter_{0}_of_1000'.format(_included)
+    benchmark(items=1000)(_setup)
+
+
+def _nested_dict_of_lists_of_serializers(compiled):
+    field = PartialDictField(included_keys=['a', 'b'],
+                             child=ListOrItemField(child=EmbeddedSerializer()), compiled=compiled)
+    data = {
+        'a': [{'name': 'value', 'count': i} for i in range(500)],
+        'b': [{'name': 'value', 'count': i} for i in range(500)],
+        'c': [{'name': 'value', 'count': i} for i in range(500)],
+    }
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=1000)
+def nested_dict_of_lists_of_serializers():
+    return _nested_dict_of_lists_of_serializers(False)
+
+
+@benchmark(items=1000)
+def nested_dict_of_lists_of_serializers_compiled():
+    return _nested_dict_of_lists_of_serializers(True)
+
+
+def _nested_deep_lists(compiled):
+    field = ListOrItemField(child=ListOrItemField(child=ListOrItemField(
+        child=serializers.IntegerField())), compiled=compiled)
+    data = [[[i] * 10] * 10 for i in range(10)]
+    return lambda: field.run_validation(data)
+
+
+@benchmark(items=1000)
+def nested_deep_lists():
+    return _nested_deep_lists(False)
+
+
+@benchmark(items=1000)
+def nested_deep_lists_compiled():
+    return _nested_deep_lists(True)
+
+
+@benchmark(items=100)
+def listoritem_field_construction():
+    return lambda: [ListOrItemField(child=serializers.CharField()) for _ in range(100)]
+
+
+@benchmark(items=100)
+def partialdict_field_construction():
+    included_keys = ['k{0}'.format(i) for i in range(10)]
+    return lambda: [PartialDictField(included_keys, child=serializers.CharField())
+                    for _ in range(100)]
+
+
+def _serializer_instantiation(share_child):
+    class ContainerSerializer(serializers.Serializer):
+        embedded = ListOrItemField(child=EmbeddedSerializer(), share_child=share_child)
+        tags = ListOrItemField(child=serializers.CharField(), share_child=share_child)
+        details = PartialDictField(['a', 'b'], child=ListOrItemField(
+            child=EmbeddedSerializer()), share_child=share_child)
+
+    return lambda: ContainerSerializer(data={}).fields
+
+
+@benchmark()
+def serializer_instantiation():
+    return _serializer_instantiation(False)
+
+
+@benchmark()
+def serializer_instantiation_shared_child():
+    return _serializer_instantiation(True)
+
+
+def measure(setup, items, repeat):
+    operation = setup()
+    timer = timeit.Timer(operation)
+    number, _total = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    tracemalloc.start()
+    try:
+        operation()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'ops_per_sec': 1.0 / best,
+        'usec_per_item': best * 1e6 / items,
+        'peak_kib': peak / 1024.0,
+    }
+
+
+def regressions(result, baseline, threshold):
+    """
+    Get descriptions of how the result regressed from the baseline by more than the threshold.
+    """
+    found = []
+    if result['ops_per_sec'] < baseline['ops_per_sec'] * (1 - threshold):
+        found.append('ops/sec {0:+.0%}'.format(
+            result['ops_per_sec'] / baseline['ops_per_sec'] - 1))
+    if result['peak_kib'] > baseline['peak_kib'] * (1 + threshold) + 1:
+        found.append('peak memory {0:+.0%}'.format(
+            result['peak_kib'] / max(baseline['peak_kib'], 1) - 1))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('names', nargs='*', help='run benchmarks whose names contain these')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions (best is kept)')
+    parser.add_argument('--save', metavar='PATH', help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare the results to a baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown or memory growth flagged as a regression')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print('{0:48} {1:>12} {2:>12} {3:>10}'.format('benchmark', 'ops/sec', 'usec/item', 'peak KiB'))
+    results = {}
+    failed = False
+    for name, setup, items in BENCHMARKS:
+        if args.names and not any(n in name for n in args.names):
+            continue
+        result = results[name] = measure(setup, items, args.repeat)
+        line = '{0:48} {1:12.1f} {2:12.3f} {3:10.1f}'.format(
+            name, result['ops_per_sec'], result['usec_per_item'], result['peak_kib'])
+        if name in baseline:
+            found = regressions(result, baseline[name], args.threshold)
+            if found:
+                failed = True
+                line += '  REGRESSION: ' + ', '.join(found)
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
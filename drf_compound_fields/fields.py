@@ -7,57 +7,1826 @@ fields.
 """
 
 
+from array import array
+import asyncio
+from collections import OrderedDict
+from collections.abc import Iterator
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+import copy
+import fnmatch
+import functools
+import hashlib
+import inspect
+import itertools
+import math
+import multiprocessing
+import os
+import pickle
+import re
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.fields import empty
+from rest_framework.fields import SkipField
+from rest_framework.fields import get_error_detail
+from rest_framework.relations import ManyRelatedField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.relations import RelatedField
+from rest_framework.serializers import BooleanField
+from rest_framework.serializers import CharField
+from rest_framework.serializers import DecimalField
 from rest_framework.serializers import DictField
 from rest_framework.serializers import Field
-from rest_framework.serializers import ListField
+from rest_framework.serializers import FloatField
+from rest_framework.serializers import IntegerField
+from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import JSONField
+from rest_framework.serializers import ListField  # noqa: F401 (kept importable from here)
+from rest_framework.serializers import ReadOnlyField
+from rest_framework.serializers import Serializer
+from rest_framework.serializers import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils import html
+from rest_framework.utils import model_meta
+
+from .instrumentation import get_sink
+from .instrumentation import instrumented
+
+
+# Integers within this bound always round-trip through IntegerField's string-based conversion.
+_NATIVE_INT_LIMIT = 2 ** 63
+
+# Checks for values that the given primitive field types would validate to themselves, unchanged.
+_NATIVE_VALUE_CHECKS = {
+    IntegerField: lambda v: type(v) is int and -_NATIVE_INT_LIMIT < v < _NATIVE_INT_LIMIT,
+    FloatField: lambda v: type(v) is float and math.isfinite(v),
+    BooleanField: lambda v: v is True or v is False,
+}
+
+
+def _native_value_check(field):
+    """
+    Get a check for values that the given field would validate to themselves, or None if the field
+    is not a stock primitive field without validators.
+    """
+    check = _NATIVE_VALUE_CHECKS.get(type(field))
+    if check is None or field.validators:
+        return None
+    return check
+
+
+# Checks for values that the given field types would represent as themselves, unchanged.
+_UNCHANGED_REPRESENTATION_CHECKS = {
+    CharField: lambda v: type(v) is str,
+    IntegerField: lambda v: type(v) is int,
+    FloatField: lambda v: type(v) is float,
+    BooleanField: lambda v: v is True or v is False,
+    ReadOnlyField: lambda v: True,
+    JSONField: lambda v: True,
+}
+
+
+def _represented_unchanged(field, values):
+    """
+    Whether the field represents each of the given values (or None) as the value itself.
+    """
+    check = _UNCHANGED_REPRESENTATION_CHECKS.get(type(field))
+    if check is None or getattr(field, 'binary', False):
+        return False
+    return all(value is None or check(value) for value in values)
+
+
+# Checks for values that fields of the given types (or their subclasses, not overriding
+# to_internal_value) could plausibly validate, only rejecting values of types they always reject.
+_SCALAR_STRUCTURE_CHECKS = (
+    (CharField, lambda v: isinstance(v, (str, int, float)) and not isinstance(v, bool)),
+    (IntegerField, lambda v: not isinstance(v, (bool, list, dict))),
+    (DecimalField, lambda v: not isinstance(v, (bool, list, dict))),
+    (FloatField, lambda v: not isinstance(v, (list, dict))),
+    (BooleanField, lambda v: not isinstance(v, (list, dict))),
+)
+
+
+def _structure_check(field):
+    """
+    Get a check of the structure of the raw values for the field, derived from its tree of fields:
+    container types, scalar types and required keys. Values failing the check are certainly
+    invalid, while those passing it are only plausibly valid. None if the field is not checked.
+    """
+    if field.read_only:
+        return None
+    check = _value_structure_check(field)
+    if check is None:
+        return None
+    allow_null = field.allow_null
+    return lambda v: allow_null if v is None else check(v)
+
+
+def _value_structure_check(field):
+    for field_type, check in _SCALAR_STRUCTURE_CHECKS:
+        if (isinstance(field, field_type) and
+                type(field).to_internal_value is field_type.to_internal_value):
+            return check
+    if type(field) is ListOrItemField:
+        item_check = _structure_check(field.item_field)
+        if item_check is None:
+            return None
+        return lambda v: all(map(item_check, v)) if isinstance(v, list) else item_check(v)
+    if type(field) is PartialDictField:
+        checks = field._structure_checks()
+        value_checks = tuple(
+            (key, checks[str(key)] if isinstance(checks, Mapping) else checks)
+            for key in field.included_keys)
+
+        def check(v):
+            if html.is_html_input(v):
+                return True
+            if not isinstance(v, dict):
+                return False
+            return all(check(v[key]) for key, check in value_checks if key in v)
+        return check
+    if isinstance(field, Serializer) and (
+            type(field).to_internal_value is Serializer.to_internal_value):
+        fields = tuple(
+            (child.field_name, child.required, _structure_check(child))
+            for child in field._writable_fields)
+
+        def check(v):
+            if html.is_html_input(v):
+                return True
+            if not isinstance(v, Mapping):
+                return False
+            partial = getattr(field.root, 'partial', False)
+            for name, required, child_check in fields:
+                if name in v:
+                    if child_check is not None and not child_check(v[name]):
+                        return False
+                elif required and not partial:
+                    return False
+            return True
+        return check
+    return None
+
+
+def _validate_implausible(field, child, items, check):
+    """
+    Validate only the values of the given (key, value) pairs failing the structure check (or,
+    given a mapping of checks by key, the check for each key) with the child field, raising a
+    ValidationError with their errors as for _iter_validated, if any.
+    """
+    checks = check if isinstance(check, Mapping) else None
+    implausible = [
+        (key, item) for key, item in items
+        if not (check if checks is None else checks[key])(item)
+    ]
+    if implausible:
+        for _pair in _iter_validated(field, child, implausible, field.max_errors):
+            pass
+
+
+_GLOB_CHARS = frozenset('*?[')
+_SCOPED_REGEX_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'),
+                       (re.VERBOSE, 'x'), (re.ASCII, 'a'))
+# The flags of compiled regular expressions that can be scoped to them in a combined one.
+_SCOPABLE_REGEX_FLAGS = functools.reduce(
+    lambda flags, scoped: flags | scoped[0], _SCOPED_REGEX_FLAGS, re.UNICODE)
+
+
+def _key_positions(keys):
+    """
+    Get the dict of the positions of the given keys, by key.
+    """
+    return dict((key, position) for position, key in enumerate(keys))
+
+
+def _key_matcher(patterns):
+    """
+    Compile the given key patterns, globs or compiled regular expressions matching whole keys, into
+    a single function matching str keys, or None if there are none.
+
+    Globs that are only a prefix followed by "*" are matched as prefixes, and the rest (and the
+    regular expressions without groups, whose flags can be scoped to them) as one combined regular
+    expression. Other regular expressions are matched on their own, so that their groups (and
+    backreferences to those) and flags keep their meaning.
+    """
+    prefixes = []
+    regexes = []
+    fullmatches = []
+    for pattern in patterns:
+        if isinstance(pattern, re.Pattern):
+            if pattern.groups or pattern.flags & ~_SCOPABLE_REGEX_FLAGS:
+                fullmatches.append(pattern.fullmatch)
+                continue
+            flags = ''.join(c for flag, c in _SCOPED_REGEX_FLAGS if pattern.flags & flag)
+            regexes.append('(?{0}:{1})'.format(flags, pattern.pattern) if flags else
+                           '(?:{0})'.format(pattern.pattern))
+        elif pattern.endswith('*') and not _GLOB_CHARS.intersection(pattern[:-1]):
+            prefixes.append(pattern[:-1])
+        else:
+            regexes.append(fnmatch.translate(pattern))
+    prefixes = tuple(prefixes)
+    if regexes:
+        fullmatches.insert(0, re.compile('|'.join(regexes)).fullmatch)
+    if not prefixes and not fullmatches:
+        return None
+    if not fullmatches:
+        return lambda key: key.startswith(prefixes)
+    if not prefixes and len(fullmatches) == 1:
+        fullmatch = fullmatches[0]
+        return lambda key: fullmatch(key) is not None
+    return lambda key: (
+        key.startswith(prefixes) or any(fullmatch(key) is not None for fullmatch in fullmatches))
+
+
+class _BulkRelatedChild(object):
+    """
+    Stands in for a PrimaryKeyRelatedField child, to validate the given values with the objects
+    they refer to fetched in one query, rather than one query per value.
+
+    Values that can't be looked up in bulk (e.g., that are empty or of the wrong type) are
+    validated by the child field itself, so that all errors are the same as for the child.
+    """
+
+    def __init__(self, child, values):
+        self.child = child
+        queryset = child.get_queryset()
+        pk = queryset.model._meta.pk
+        connection = connections[queryset.db]
+        # Integer pk values out of the database's range are left to the child, as they can't be
+        # given to the bulk query.
+        pk_range = connection.ops.integer_field_ranges.get(pk.get_internal_type())
+        # The pk value given to the child's lookup (for its error messages), and the normalized pk
+        # value, by the type and value of each distinct value.
+        self.lookups = {}
+        for value in values:
+            if value is None or value == '' or isinstance(value, bool):
+                continue
+            try:
+                key = (type(value), value)
+                if key in self.lookups:
+                    continue
+                data = value
+                if child.pk_field is not None:
+                    data = child.pk_field.to_internal_value(data)
+                pk_value = pk.to_python(data)
+                if pk_range is not None and not pk_range[0] <= pk_value <= pk_range[1]:
+                    continue
+                self.lookups[key] = (data, pk_value)
+            except (TypeError, ValueError, ValidationError, DjangoValidationError):
+                continue
+        pk_values = set(pk_value for _data, pk_value in self.lookups.values())
+        self.objects = {}
+        if not pk_values:
+            return
+        try:
+            # In a transaction, a failed query must be rolled back to a savepoint for the child's
+            # own lookups to run.
+            if connection.in_atomic_block:
+                with transaction.atomic(using=queryset.db):
+                    self.objects = dict((obj.pk, obj) for obj in queryset.filter(pk__in=pk_values))
+            else:
+                self.objects = dict((obj.pk, obj) for obj in queryset.filter(pk__in=pk_values))
+        except (DatabaseError, OverflowError, TypeError, ValueError):
+            # Leave all the values to the child, so each gets its own error.
+            self.lookups = {}
+
+    def run_validation(self, value):
+        try:
+            data, pk_value = self.lookups[(type(value), value)]
+        except (KeyError, TypeError):
+            return self.child.run_validation(value)
+        try:
+            obj = self.objects[pk_value]
+        except KeyError:
+            self.child.fail('does_not_exist', pk_value=data)
+        self.child.run_validators(obj)
+        return obj
+
+
+def _batch_child(child, values):
+    """
+    Get the stand-in for the child field to validate the given values in batch, which resolves the
+    lookups of primary key related fields in bulk, or the child itself.
+    """
+    if (isinstance(child, PrimaryKeyRelatedField) and
+            type(child).to_internal_value is PrimaryKeyRelatedField.to_internal_value and
+            isinstance(child.get_queryset(), QuerySet)):
+        return _BulkRelatedChild(child, values)
+    return child
+
+
+class _MemoizedChild(object):
+    """
+    Stands in for a child field, to validate each distinct hashable value once, reusing the
+    internal value (or errors) for repeats of the value. At most maxsize of the most recently used
+    values are kept.
+    """
+
+    def __init__(self, child, maxsize):
+        self.child = child
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+
+    def run_validation(self, value):
+        # Values of different types may be equal (e.g., 1 and True), but not validate the same.
+        key = (type(value), value)
+        try:
+            valid, result = self.cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return self.child.run_validation(value)
+        else:
+            self.cache.move_to_end(key)
+            if valid:
+                return result
+            raise ValidationError(result)
+        try:
+            result = self.child.run_validation(value)
+        except ValidationError as e:
+            self._store(key, False, e.detail)
+            raise
+        except DjangoValidationError as e:
+            self._store(key, False, get_error_detail(e))
+            raise
+        self._store(key, True, result)
+        return result
+
+    def _store(self, key, valid, result):
+        self.cache[key] = (valid, result)
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+
+def _validation_child(field, child, values=None):
+    """
+    Get the stand-in for the child field to validate the given values in one call, as configured
+    by the field's batch and memoize options.
+    """
+    if field.batch and values is not None:
+        child = _batch_child(child, values)
+    if field.memoize:
+        child = _MemoizedChild(child, field.memoize)
+    return child
+
+
+# The key of the groups of errors in sparse errors.
+SPARSE_ERRORS_KEY = 'error_groups'
+
+
+def _error_fingerprint(detail):
+    """
+    Get a hashable fingerprint of the given error detail, equal for equal details.
+    """
+    if isinstance(detail, Mapping):
+        return tuple((key, _error_fingerprint(value)) for key, value in detail.items())
+    if isinstance(detail, (list, tuple)):
+        return tuple(_error_fingerprint(value) for value in detail)
+    return (str(detail), getattr(detail, 'code', None))
+
+
+def _compact_keys(keys):
+    """
+    Get the list of the given keys, as str, with runs of consecutive int keys as "first-last".
+    """
+    if not all(type(key) is int for key in keys):
+        return [str(key) for key in keys]
+    compact = []
+    first = last = keys[0]
+    for key in keys[1:] + [None]:
+        if key is not None and key == last + 1:
+            last = key
+            continue
+        compact.append(str(first) if first == last else '{0}-{1}'.format(first, last))
+        first = last = key
+    return compact
+
+
+def _join_keys(keys):
+    """
+    Get the group key listing the given keys (compacted by _compact_keys), separated by commas,
+    with the commas and backslashes in them escaped by a backslash.
+    """
+    return ','.join(
+        key.replace('\\', '\\\\').replace(',', '\\,') for key in _compact_keys(keys))
+
+
+def _split_keys(listed):
+    """
+    Get the list of the keys listed in the given group key (see _join_keys).
+    """
+    keys = ['']
+    chars = iter(listed)
+    for char in chars:
+        if char == '\\':
+            keys[-1] += next(chars, '')
+        elif char == ',':
+            keys.append('')
+        else:
+            keys[-1] += char
+    return keys
+
+
+def sparse_errors(errors):
+    """
+    Get the sparse form of the given errors by key, grouping the keys with equal errors: a dict of
+    the groups (under SPARSE_ERRORS_KEY), each the errors of its keys, once, by the group key
+    listing those (e.g., "0-2,5", with runs of consecutive indexes as "first-last", see
+    _join_keys). Non-field errors are kept as they are.
+
+    The keys are listed in the group keys, rather than in values, so that DRF doesn't take them
+    for errors (e.g., in ValidationError.get_codes).
+    """
+    groups = OrderedDict()
+    for key, detail in errors.items():
+        if key == api_settings.NON_FIELD_ERRORS_KEY:
+            continue
+        group = groups.setdefault(_error_fingerprint(detail), (detail, []))
+        group[1].append(key)
+    sparse = {
+        SPARSE_ERRORS_KEY: OrderedDict(
+            (_join_keys(keys), detail) for detail, keys in groups.values()),
+    }
+    if api_settings.NON_FIELD_ERRORS_KEY in errors:
+        sparse[api_settings.NON_FIELD_ERRORS_KEY] = errors[api_settings.NON_FIELD_ERRORS_KEY]
+    return sparse
+
+
+def _expand_sparse_errors(detail, parse_key, child_for_key):
+    """
+    Expand sparse errors (see sparse_errors) into the errors by key, parsing each listed key with
+    parse_key into the keys it stands for, and expanding their errors as the (compound) child
+    field for each key would. Other details are returned as they are.
+    """
+    if not isinstance(detail, Mapping) or SPARSE_ERRORS_KEY not in detail:
+        return detail
+    errors = {}
+    for group_key, group_errors in detail[SPARSE_ERRORS_KEY].items():
+        for listed in _split_keys(str(group_key)):
+            for key in parse_key(listed):
+                child = child_for_key(key)
+                errors[key] = (
+                    child.expand_errors(group_errors)
+                    if isinstance(child, (ListOrItemField, PartialDictField)) else
+                    group_errors)
+    if api_settings.NON_FIELD_ERRORS_KEY in detail:
+        errors[api_settings.NON_FIELD_ERRORS_KEY] = detail[api_settings.NON_FIELD_ERRORS_KEY]
+    return errors
+
+
+def _parse_indexes(listed):
+    first, _sep, last = listed.partition('-')
+    return range(int(first), int(last or first) + 1)
+
+
+def _validation_error(field, errors):
+    """
+    Get the ValidationError for the given errors by key of the field, in sparse form if the field
+    has sparse_errors.
+    """
+    if field.sparse_errors:
+        return ValidationError(sparse_errors(errors))
+    return ValidationError(errors)
+
+
+def _max_errors_detail(field, max_errors):
+    message = field.error_messages['max_errors'].format(max_errors=max_errors)
+    return [ErrorDetail(message, code='max_errors')]
+
+
+def _iter_validated(field, child, items, max_errors=None, check=None):
+    """
+    Validate the values of the given (key, value) pairs with the child field (or, given a mapping
+    of fields by key, the field for each key), generating pairs of the keys and internal values
+    until the first invalid value.
+
+    Once max_errors invalid values have been seen, or the items are exhausted, a ValidationError is
+    raised with the errors of the invalid values by their key. If validation was stopped by
+    max_errors, the field's max_errors message is added under the non-field errors key.
+    """
+    children = child if isinstance(child, Mapping) else None
+    errors = {}
+    for key, item in items:
+        if check is not None and check(item):
+            value = item
+        else:
+            try:
+                if children is not None:
+                    child = children[key]
+                value = child.run_validation(item)
+            except (ValidationError, DjangoValidationError) as e:
+                errors[key] = e.detail if isinstance(e, ValidationError) else get_error_detail(e)
+                if max_errors is not None and len(errors) >= max_errors:
+                    errors[api_settings.NON_FIELD_ERRORS_KEY] = _max_errors_detail(
+                        field, max_errors)
+                    break
+                continue
+        if not errors:
+            yield key, value
+    if errors:
+        raise _validation_error(field, errors)
+
+
+# Array type codes for the columns of internal values of the given field types.
+_COLUMN_TYPECODES = {
+    IntegerField: 'q',
+    FloatField: 'd',
+}
+
+
+def _column(field, values):
+    """
+    Pack a column of internal values of the field into an array, if the field type has one and
+    the values fit it, or else keep the list.
+    """
+    typecode = _COLUMN_TYPECODES.get(type(field))
+    if typecode is not None:
+        try:
+            return array(typecode, values)
+        except (TypeError, OverflowError):
+            pass
+    return values
+
+
+def _validates_by_field(serializer):
+    """
+    Whether the serializer's validation is only that of each of its fields, so that its fields can
+    validate items without it.
+    """
+    serializer_type = type(serializer)
+    if (serializer_type.to_internal_value is not Serializer.to_internal_value or
+            serializer_type.run_validation is not Serializer.run_validation or
+            serializer_type.validate is not Serializer.validate or serializer.validators):
+        return False
+    return all(
+        getattr(serializer, 'validate_' + field.field_name, None) is None
+        for field in serializer._writable_fields
+    )
+
+
+# Process pools for parallel validation, by their number of workers.
+_process_pools = {}
+
+
+def _init_worker():
+    # Forked workers don't use the database connections inherited from the parent process.
+    connections.close_all()
+
+
+def _get_process_pool(max_workers):
+    """
+    Get the process pool of the given number of workers, or None if processes can't be forked.
+    Workers are forked, rather than spawned, so that they share the configuration of the parent
+    process (e.g., Django settings configured in code).
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    pool = _process_pools.get(max_workers)
+    if pool is None:
+        pool = _process_pools[max_workers] = ProcessPoolExecutor(
+            max_workers, mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker)
+    return pool
+
+
+def _queries_database(field):
+    """
+    Whether the field, or any field nested in it, may query the database: a model serializer, a
+    related field, or a field with a validator of a queryset (e.g., UniqueValidator).
+    """
+    if isinstance(field, (ModelSerializer,) + _IO_BOUND_FIELDS):
+        return True
+    if any(hasattr(validator, 'queryset') for validator in field.validators):
+        return True
+    if isinstance(field, Serializer):
+        nested = field.fields.values()
+    elif isinstance(field, PartialDictField) and field.child_fields is not None:
+        nested = field.child_fields.values()
+    else:
+        nested = [getattr(field, name) for name in ('item_field', 'child') if hasattr(field, name)]
+    return any(_queries_database(child) for child in nested)
+
+
+def _pickled_child(field, child):
+    """
+    Get the pickled unbound copy of the child field for worker processes, or None if the child
+    can't be validated in them: if it may query the database (see _queries_database), or if it
+    can't be pickled (e.g., it has a lambda validator, or is of a serializer class defined in a
+    function). Kept on the field.
+    """
+    pickled = getattr(field, '_parallel_child_pickle', _missing)
+    if pickled is _missing:
+        pickled = None
+        if not _queries_database(child):
+            try:
+                # Workers get an unbound copy of the child, so the parent serializer and its data
+                # aren't pickled along with it.
+                pickled = pickle.dumps(copy.deepcopy(child))
+            except (pickle.PicklingError, AttributeError, TypeError):
+                pass
+        field._parallel_child_pickle = pickled
+    return pickled
+
+
+def _validate_chunk(pickled_child, items):
+    """
+    Validate the values of the given (key, value) pairs with the pickled child field in a worker
+    process, returning the list of pairs of the keys and internal values, and the dict of errors by
+    key.
+    """
+    child = pickle.loads(pickled_child)
+    results = []
+    errors = {}
+    for key, item in items:
+        try:
+            results.append((key, child.run_validation(item)))
+        except ValidationError as e:
+            errors[key] = e.detail
+        except DjangoValidationError as e:
+            errors[key] = get_error_detail(e)
+    return results, errors
+
+
+def _parallel_validated(field, child, items, max_errors=None, max_workers=None):
+    """
+    Validate the values of the given list of (key, value) pairs with the child field in chunks
+    across a process pool, returning the list of pairs of the keys and internal values.
+
+    Results and errors are merged back in the order of the items, so that the result, or the
+    ValidationError raised, is the same as for sequential validation with _iter_validated, which
+    is used instead where processes can't be forked, or for children that can't be validated in
+    worker processes (see _pickled_child).
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    pool = _get_process_pool(max_workers)
+    pickled_child = _pickled_child(field, child) if pool is not None else None
+    if pickled_child is None:
+        return list(_iter_validated(field, child, items, max_errors))
+    chunk_size = max(1, -(-len(items) // (max_workers * 4)))
+    futures = [
+        pool.submit(_validate_chunk, pickled_child, items[start:start + chunk_size])
+        for start in range(0, len(items), chunk_size)
+    ]
+    results = []
+    errors = {}
+    for future in futures:
+        chunk_results, chunk_errors = future.result()
+        results.extend(chunk_results)
+        # Errors of each chunk are in the order of its items.
+        for key, detail in chunk_errors.items():
+            errors[key] = detail
+            if max_errors is not None and len(errors) >= max_errors:
+                break
+        if max_errors is not None and len(errors) >= max_errors:
+            for pending in futures:
+                pending.cancel()
+            errors[api_settings.NON_FIELD_ERRORS_KEY] = _max_errors_detail(field, max_errors)
+            break
+    if errors:
+        raise _validation_error(field, errors)
+    return results
+
+
+# Child field types whose conversions do I/O, and so are run with sync_to_async.
+_IO_BOUND_FIELDS = (RelatedField, ManyRelatedField)
+
+
+def _is_async_child(child):
+    return hasattr(child, 'arun_validation') or isinstance(child, _IO_BOUND_FIELDS)
+
+
+async def _achild_call(semaphore, child, name, value):
+    """
+    Call the named conversion method of the child field, awaiting its async counterpart if it has
+    one, or running it with sync_to_async if the child does I/O.
+
+    Sync methods run thread-sensitively, in the thread that holds the database connections, since
+    the fields that do I/O are related fields querying the database.
+    """
+    async_method = getattr(child, 'a' + name, None)
+    async with semaphore:
+        if async_method is not None:
+            return await async_method(value)
+        return await sync_to_async(getattr(child, name))(value)
+
+
+async def _avalidated(field, child, items, max_errors=None):
+    """
+    Validate the values of the given list of (key, value) pairs with the child field concurrently,
+    at most field.max_concurrency at a time, returning the list of pairs of the keys and internal
+    values.
+
+    Errors are reported as for _iter_validated, except that all values are validated before the
+    max_errors budget is applied.
+    """
+    semaphore = asyncio.Semaphore(field.max_concurrency)
+
+    async def validate(item):
+        try:
+            return True, await _achild_call(semaphore, child, 'run_validation', item)
+        except ValidationError as e:
+            return False, e.detail
+        except DjangoValidationError as e:
+            return False, get_error_detail(e)
+
+    outcomes = await asyncio.gather(*[validate(item) for _key, item in items])
+    results = []
+    errors = {}
+    for (key, _item), (valid, value) in zip(items, outcomes):
+        if valid:
+            results.append((key, value))
+            continue
+        errors[key] = value
+        if max_errors is not None and len(errors) >= max_errors:
+            errors[api_settings.NON_FIELD_ERRORS_KEY] = _max_errors_detail(field, max_errors)
+            break
+    if errors:
+        raise _validation_error(field, errors)
+    return results
+
+
+async def _arepresented(field, child, items):
+    """
+    Represent the values of the given list of (key, value) pairs with the child field concurrently,
+    at most field.max_concurrency at a time, returning the list of pairs of the keys and
+    representations.
+    """
+    semaphore = asyncio.Semaphore(field.max_concurrency)
+
+    async def represent(item):
+        if item is None:
+            return None
+        return await _achild_call(semaphore, child, 'to_representation', item)
 
+    representations = await asyncio.gather(*[represent(item) for _key, item in items])
+    return [(key, value) for (key, _item), value in zip(items, representations)]
 
 
+# The budgets of elements left for the compound fields being validated in the current context.
+_item_budget = ContextVar('drf_compound_fields_item_budget', default=None)
 
 
-class ListOrItemField(Field):
+class _ItemBudget(object):
+    """
+    The number of elements that compound fields may still be given, within the max_total_items of
+    a field being validated, and of the fields it's nested in.
+    """
+
+    def __init__(self, remaining, parent):
+        self.remaining = remaining
+        self.parent = parent
+
+
+class _ItemBudgetExceeded(Exception):
+    """
+    Raised through the conversions of nested fields once the given budget is exceeded, to be
+    reported by the field it belongs to.
+    """
+
+    def __init__(self, budget):
+        super(_ItemBudgetExceeded, self).__init__(budget)
+        self.budget = budget
+
+
+def _charge_items(count):
+    """
+    Charge the given number of elements to the active item budgets, if any.
+    """
+    budget = _item_budget.get()
+    while budget is not None:
+        budget.remaining -= count
+        if budget.remaining < 0:
+            raise _ItemBudgetExceeded(budget)
+        budget = budget.parent
+
+
+class _TotalItemsLimitMixin(object):
+    """
+    Lets compound fields limit the total number of elements of the lists and dicts given to them
+    and their nested compound fields, when max_total_items is given.
+
+    Each compound field charges the size of its list or dict to the budget before converting any
+    of it, so an oversized input is rejected as soon as the limit is exceeded. Elements validated
+    in parallel worker processes aren't charged.
+    """
+
+    def run_validation(self, data=empty):
+        if self.max_total_items is None:
+            return super(_TotalItemsLimitMixin, self).run_validation(data)
+        budget = _ItemBudget(self.max_total_items, _item_budget.get())
+        token = _item_budget.set(budget)
+        try:
+            return super(_TotalItemsLimitMixin, self).run_validation(data)
+        except _ItemBudgetExceeded as e:
+            if e.budget is not budget:
+                raise
+            self.fail('max_total_items', max_total_items=self.max_total_items)
+        finally:
+            _item_budget.reset(token)
+
+    async def arun_validation(self, data=empty):
+        if self.max_total_items is None:
+            return await super(_TotalItemsLimitMixin, self).arun_validation(data)
+        budget = _ItemBudget(self.max_total_items, _item_budget.get())
+        token = _item_budget.set(budget)
+        try:
+            return await super(_TotalItemsLimitMixin, self).arun_validation(data)
+        except _ItemBudgetExceeded as e:
+            if e.budget is not budget:
+                raise
+            self.fail('max_total_items', max_total_items=self.max_total_items)
+        finally:
+            _item_budget.reset(token)
+
+
+def _pop_options(field, kwargs):
+    """
+    Pop the field's options (named by its _options) from the given kwargs, setting only those
+    given on the field. The rest keep their class attribute defaults, so that fields stay within
+    the size of attribute dict that instances of a class share their keys in.
+    """
+    for name in field._options:
+        if name in kwargs:
+            setattr(field, name, kwargs.pop(name))
+    if kwargs.pop('fail_fast', False):
+        field.max_errors = 1
+
+
+# Marks values missing from caches.
+_missing = object()
+
+# Distinguishes the local-memory caches of representation caches, since those of the same name
+# share their storage.
+_cache_numbers = itertools.count()
+
+
+def _qualified_name(obj):
+    return '{0}.{1}'.format(obj.__module__, obj.__qualname__)
+
+
+def _declaration(value):
+    """
+    Get a stable description of a value given to a field declaration, identifying it across
+    processes: fields and serializers by their qualified class name and declaration arguments,
+    classes by their qualified name, and functions by their qualified name and first line (telling
+    lambdas apart). Other objects are described by their deconstruction, if they're deconstructible
+    (e.g., Django validators), or else only by their qualified class name.
+    """
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return value
+    if isinstance(value, Field):
+        return (_qualified_name(type(value)), _declaration(value._args),
+                _declaration(value._kwargs))
+    if isinstance(value, type):
+        return _qualified_name(value)
+    if inspect.isfunction(value):
+        return (_qualified_name(value), value.__code__.co_firstlineno)
+    if inspect.ismethod(value):
+        return (_declaration(value.__func__), _declaration(value.__self__))
+    if isinstance(value, Mapping):
+        return sorted(((repr(key), _declaration(item)) for key, item in value.items()), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [_declaration(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_declaration(item) for item in value), key=repr)
+    if hasattr(value, 'deconstruct'):
+        return _declaration(value.deconstruct())
+    return _qualified_name(type(value))
+
+
+class RepresentationCache(object):
+    """
+    A cache of the representations of compound fields across requests, by the fingerprint of the
+    represented value and the configuration of the field, counting its hits and misses.
+
+    Representations are kept in the given Django cache, or by default in a local-memory cache of
+    at most max_entries, which evicts the least recently used ones (a third at a time) when full.
+    Copies of fields share their cache.
+
+    Representations are cached regardless of the serializer context, so fields whose children
+    depend on it (e.g., hyperlinked fields, built from the request) must not be cached.
+    """
+
+    def __init__(self, cache=None, max_entries=1000):
+        if cache is None:
+            cache = LocMemCache(
+                'drf_compound_fields.representations.{0}'.format(next(_cache_numbers)),
+                {'OPTIONS': {'MAX_ENTRIES': max_entries}})
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def key(self, field, fingerprint):
+        """
+        Get the cache key for the fingerprint of a value represented by the field.
+        """
+        config = getattr(field, '_representation_config', None)
+        if config is None:
+            # The declaration of the field, leaving out the caching options.
+            kwargs = dict(
+                (name, value) for name, value in field._kwargs.items()
+                if name not in ('cache_fingerprint', 'representation_cache'))
+            config = field._representation_config = repr(
+                (_qualified_name(type(field)), _declaration(field._args), _declaration(kwargs)))
+        return hashlib.sha1(repr((config, fingerprint)).encode('utf-8')).hexdigest()
+
+    def represent(self, field, obj, to_representation):
+        """
+        Get the representation of the value by the field from the cache, or else by calling
+        to_representation and caching it.
+        """
+        fingerprint = field.cache_fingerprint(obj)
+        if fingerprint is None:
+            return to_representation(obj)
+        key = self.key(field, fingerprint)
+        value = self.cache.get(key, _missing)
+        if value is not _missing:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = to_representation(obj)
+        self.cache.set(key, value, None)
+        return value
+
+
+# The representation cache of fields that aren't given one.
+default_representation_cache = RepresentationCache()
+
+
+def _cached_representation(method):
+    """
+    Decorate the to_representation method of a compound field, to cache its representations
+    across requests when the field's cache_fingerprint is given: a function getting a fingerprint
+    identifying each represented value and its contents (e.g., a pk and a version), or None for
+    values not to be cached. The cache is keyed by the fingerprint and the field's declaration
+    (see RepresentationCache), not by the identity of the value.
+    """
+    @functools.wraps(method)
+    def wrapper(field, obj):
+        if field.cache_fingerprint is None:
+            return method(field, obj)
+        cache = field.representation_cache or default_representation_cache
+        return cache.represent(field, obj, functools.partial(method, field))
+    return wrapper
+
+
+class _SharedChildMixin(object):
+    """
+    Lets compound fields be copied with their already built (and bound) child field shared, rather
+    than copied, when share_child is true.
+
+    DRF deep-copies the declared fields of a serializer for every serializer instance, which for
+    compound fields means copying and re-binding the whole child field tree. With share_child, the
+    declared field instead acts as a template: its child is built once and reused by all copies.
+    The shared child stays bound to the template, so it must not depend on the serializer context.
+    Copies bound under a partial serializer get their own copy of the child instead, bound to them,
+    since fields check the partial option of their root serializer.
+    """
+
+    def __deepcopy__(self, memo):
+        if not self.share_child:
+            return super(_SharedChildMixin, self).__deepcopy__(memo)
+        # A shallow copy, to be bound to a new parent, that refers to the same child.
+        return copy.copy(self)
+
+    def bind(self, field_name, parent):
+        super(_SharedChildMixin, self).bind(field_name, parent)
+        if self.share_child and getattr(self.root, 'partial', False):
+            self._unshare_child()
+            # Compiled converters refer to the shared child.
+            self._compiled_converters = None
+
+
+def _compiled_run_validation(child):
+    """
+    Get a function equivalent to the child field's run_validation, compiled if the child is a
+    compound field that can be compiled.
+    """
+    if not isinstance(child, _CompiledMixin) or not child._compilable():
+        return child.run_validation
+    to_internal_value = child._compile_internal_value()
+    validate_empty_values = child.validate_empty_values
+    run_validators = child.run_validators if child.validators else None
+
+    def run_validation(data=empty):
+        (is_empty_value, data) = validate_empty_values(data)
+        if is_empty_value:
+            return data
+        value = to_internal_value(data)
+        if run_validators is not None:
+            run_validators(value)
+        return value
+    return run_validation
+
+
+def _compiled_to_representation(child):
+    """
+    Get a function equivalent to the child field's to_representation, compiled if the child is a
+    compound field that can be compiled.
+    """
+    if not isinstance(child, _CompiledMixin) or not child._compilable():
+        return child.to_representation
+    return child._compile_representation()
+
+
+class _CompiledMixin(object):
+    """
+    Lets compound fields compile their conversions, when compiled is true.
+
+    Compiling walks the tree of the field and its nested compound fields once, producing converter
+    functions with the option checks resolved, and the conversions of nested compound fields
+    called directly rather than through the generic field machinery. Their output and errors are
+    the same as those of the interpreted conversions, which are still used when instrumentation is
+    enabled, or when the field uses options that aren't compiled (see _compilable).
+    """
+
+    _compiled_converters = None
+
+    def _compilable(self):
+        return type(self) in (ListOrItemField, PartialDictField) and not (
+            self.batch or self.memoize or self.stream or self.zero_copy or
+            self.max_errors is not None or self.max_total_items is not None or
+            self.cache_fingerprint is not None or self.precheck or self.sparse_errors or
+            self.parallel_threshold is not None)
+
+    def _compiled(self):
+        """
+        Get the pair of compiled to_internal_value and to_representation functions of the field, or
+        None if it's not to be compiled.
+        """
+        if not self.compiled or get_sink() is not None or not self._compilable():
+            return None
+        if self._compiled_converters is None:
+            self._compiled_converters = (
+                self._compile_internal_value(), self._compile_representation())
+        return self._compiled_converters
+
+
+class _AsyncValidationMixin(object):
+    """
+    Async counterpart to the validation pipeline of Field.run_validation, for compound fields that
+    implement ato_internal_value.
+
+    The async conversions only convert items concurrently without options that only the sync
+    conversions apply (see _sync_only_validation and _sync_only_representation), which they
+    otherwise run with sync_to_async.
+    """
+
+    def _sync_only_validation(self):
+        return (self.batch or self.memoize or self.precheck or
+                self.parallel_threshold is not None)
+
+    def _sync_only_representation(self):
+        return self.stream or self.zero_copy or self.cache_fingerprint is not None
+
+    async def arun_validation(self, data=empty):
+        (is_empty_value, data) = self.validate_empty_values(data)
+        if is_empty_value:
+            return data
+        value = await self.ato_internal_value(data)
+        self.run_validators(value)
+        return value
+
+
+class StreamingList(object):
+    """
+    A lazy list representation, whose items are converted by the given function as they are
+    iterated.
+    """
+
+    def __init__(self, source, convert):
+        self.source = source
+        self.convert = convert
+
+    def __len__(self):
+        return len(self.source)
+
+    def __iter__(self):
+        convert = self.convert
+        for item in self.source:
+            yield convert(item) if item is not None else None
+
+
+class StreamingDict(Mapping):
+    """
+    A lazy dict representation, whose values are converted by the given function as they are
+    accessed.
+    """
+
+    def __init__(self, source, convert):
+        self.source = source
+        self.convert = convert
+
+    def __len__(self):
+        return len(self.source)
+
+    def __iter__(self):
+        return iter(self.source)
+
+    def __getitem__(self, key):
+        value = self.source[key]
+        return self.convert(value) if value is not None else None
+
+    def items(self):
+        convert = self.convert
+        for key, value in self.source.items():
+            yield str(key), convert(value) if value is not None else None
+
+
+class ListOrItemField(_CompiledMixin, _SharedChildMixin, _TotalItemsLimitMixin,
+                      _AsyncValidationMixin, Field):
     """
     A field whose values are either a value or lists of values described by the given item field.
     The item field can be another field type (e.g., CharField) or a serializer.
+
+    The keyword options (batch, stream, max_errors, columnar, etc.) are described in the
+    ListOrItemField section of docs/usage.rst.
     """
 
+    default_error_messages = {
+        'max_errors': _('Validation stopped after {max_errors} invalid items.'),
+        'save_failed': _('This item could not be saved.'),
+        'max_length': _('Ensure this field has no more than {max_length} elements.'),
+        'max_total_items': _('Ensure this field has no more than {max_total_items} elements in '
+                             'total.'),
+    }
+
+    # Options, by their defaults, which are only set on fields they're given to (see _pop_options).
+    _options = ('batch', 'stream', 'iterative', 'memoize', 'max_errors', 'parallel_threshold',
+                'parallel_workers', 'max_concurrency', 'share_child', 'compiled', 'zero_copy',
+                'cache_fingerprint', 'representation_cache', 'columnar', 'max_length',
+                'max_total_items', 'precheck', 'sparse_errors')
+    batch = False
+    stream = False
+    iterative = False
+    memoize = None
+    max_errors = None
+    parallel_threshold = None
+    parallel_workers = None
+    max_concurrency = 10
+    share_child = False
+    compiled = False
+    zero_copy = False
+    cache_fingerprint = None
+    representation_cache = None
+    columnar = False
+    max_length = None
+    max_total_items = None
+    precheck = False
+    sparse_errors = False
+    _item_structure_check = _missing
+
     def __init__(self, child, *args, **kwargs):
+        _pop_options(self, kwargs)
+        assert self.cache_fingerprint is None or not (self.stream or self.zero_copy), (
+            'The `stream` and `zero_copy` arguments are not supported with `cache_fingerprint`.'
+        )
+        assert not inspect.isclass(child), '`child` has not been instantiated.'
+        assert child.source is None, (
+            "The `source` argument is not meaningful when applied to a `child=` field. "
+            "Remove `source=` from the field declaration."
+        )
+        assert not self.columnar or isinstance(child, Serializer), (
+            'The `columnar` argument requires a serializer `child`.'
+        )
+        assert not self.columnar or all(
+            len(field.source_attrs) == 1 for field in child.fields.values()), (
+            'The `columnar` argument requires the fields of the `child` serializer to have '
+            'single-attribute sources, not `source=\'*\'` or dotted sources.'
+        )
         super(ListOrItemField, self).__init__(*args, **kwargs)
+        # The item field is used directly for both list items and items, rather than through a
+        # ListField wrapping it.
         self.item_field = child
-        self.list_field = ListField(child=child, *args, **kwargs)
+        self.item_field.bind(field_name='', parent=self)
 
+    @instrumented
+    @_cached_representation
     def to_representation(self, obj):
+        compiled = self._compiled()
+        if compiled is not None:
+            return compiled[1](obj)
+        if self.columnar and isinstance(obj, (list, Mapping)):
+            return self._columnar_representation(obj)
         if isinstance(obj, list):
-            return self.list_field.to_representation(obj)
+            if self.stream:
+                return StreamingList(obj, self.item_field.to_representation)
+            if self.zero_copy and _represented_unchanged(self.item_field, obj):
+                return obj
+            return [
+                self.item_field.to_representation(item) if item is not None else None
+                for item in obj
+            ]
         return self.item_field.to_representation(obj)
 
+    @instrumented
     def to_internal_value(self, data):
+        compiled = self._compiled()
+        if compiled is not None:
+            return compiled[0](data)
+        if self.iterative and isinstance(data, Iterator):
+            return self.iter_internal_value(data)
+        check = _native_value_check(self.item_field) if self.batch else None
+        if isinstance(data, list):
+            self._check_length(data)
+            if self.columnar:
+                return self._columnar_internal_value(data)
+            if self.precheck:
+                _validate_implausible(
+                    self, self.item_field, enumerate(data), self._structure_checks())
+            if check is not None and all(map(check, data)):
+                return list(data)
+            if self.parallel_threshold is not None and len(data) >= self.parallel_threshold:
+                return [value for _idx, value in _parallel_validated(
+                    self, self.item_field, list(enumerate(data)), self.max_errors,
+                    self.parallel_workers)]
+            return [value for _idx, value in _iter_validated(
+                self, _validation_child(self, self.item_field, data), enumerate(data),
+                self.max_errors, check)]
+        if check is not None and check(data):
+            return data
+        # Run the item field's full validation pipeline once, and keep its result, just as for
+        # each list item.
+        return self.item_field.run_validation(data)
+
+    async def ato_representation(self, obj):
+        if not _is_async_child(self.item_field):
+            return self.to_representation(obj)
+        if self._sync_only_representation():
+            return await sync_to_async(self.to_representation)(obj)
+        if isinstance(obj, list):
+            return [value for _idx, value in await _arepresented(
+                self, self.item_field, list(enumerate(obj)))]
+        return (await _arepresented(self, self.item_field, [(None, obj)]))[0][1]
+
+    async def ato_internal_value(self, data):
+        if not _is_async_child(self.item_field) or (
+                self.iterative and isinstance(data, Iterator)):
+            return self.to_internal_value(data)
+        if self._sync_only_validation():
+            return await sync_to_async(self.to_internal_value)(data)
         if isinstance(data, list):
-            return self.list_field.to_internal_value(data)
-        # Force field validation. Not necessary on the list_field since DRF calls it recursively.
-        self.item_field.run_validation(data)
-        return self.item_field.to_internal_value(data)
+            self._check_length(data)
+            return [value for _idx, value in await _avalidated(
+                self, self.item_field, list(enumerate(data)), self.max_errors)]
+        return await _achild_call(asyncio.Semaphore(1), self.item_field, 'run_validation', data)
+
+    def _compile_internal_value(self):
+        run_validation = _compiled_run_validation(self.item_field)
+
+        check_length = self._check_length
+
+        def to_internal_value(data):
+            if not isinstance(data, list):
+                return run_validation(data)
+            check_length(data)
+            result = []
+            errors = {}
+            for idx, item in enumerate(data):
+                try:
+                    result.append(run_validation(item))
+                except ValidationError as e:
+                    errors[idx] = e.detail
+                except DjangoValidationError as e:
+                    errors[idx] = get_error_detail(e)
+            if errors:
+                raise ValidationError(errors)
+            return result
+        return to_internal_value
+
+    def _compile_representation(self):
+        represent = _compiled_to_representation(self.item_field)
+
+        def to_representation(obj):
+            if isinstance(obj, list):
+                return [represent(item) if item is not None else None for item in obj]
+            return represent(obj)
+        return to_representation
+
+    def bulk_save(self, validated_data, instances=None, batch_size=None):
+        """
+        Save the validated list (or item) of a ModelSerializer item field in bulk, returning the
+        list (or item) of saved model instances.
+
+        Items are created with bulk_create, or, if given an instance in instances (a list matching
+        the items, None for new ones), set on it and updated with bulk_update, in batches of
+        batch_size (by default, one batch). Many-to-many values are set after, per instance.
+
+        All saves are made in one transaction. When a batch fails in the database, its items are
+        saved one at a time to find the failing ones, and a ValidationError is raised with their
+        errors by index, rolling back the transaction.
+        """
+        serializer = self.item_field
+        assert isinstance(serializer, ModelSerializer), (
+            '`bulk_save` requires a ModelSerializer item field.'
+        )
+        model = serializer.Meta.model
+        relations = model_meta.get_field_info(model).relations
+        many = isinstance(validated_data, list)
+        items = validated_data if many else [validated_data]
+        if instances is None:
+            instances = [None] * len(items)
+        elif not many:
+            instances = [instances]
+        assert len(instances) == len(items), (
+            '`instances` must have an instance (or None) for each validated item.'
+        )
+        objs = []
+        created = []
+        updated = []
+        update_fields = OrderedDict()
+        many_to_many = []
+        for idx, (attrs, instance) in enumerate(zip(items, instances)):
+            attrs = dict(attrs)
+            to_many = dict(
+                (name, attrs.pop(name))
+                for name, relation in relations.items()
+                if relation.to_many and name in attrs
+            )
+            if instance is None:
+                instance = model(**attrs)
+                created.append(idx)
+            else:
+                for name, value in attrs.items():
+                    setattr(instance, name, value)
+                    update_fields[name] = None
+                updated.append(idx)
+            objs.append(instance)
+            if to_many:
+                many_to_many.append((instance, to_many))
+        using = router.db_for_write(model)
+        manager = model._default_manager.db_manager(using)
+        errors = {}
+        with transaction.atomic(using=using):
+            self._save_batches(using, objs, created, batch_size, manager.bulk_create, errors)
+            if update_fields:
+                self._save_batches(
+                    using, objs, updated, batch_size,
+                    lambda batch: manager.bulk_update(batch, list(update_fields)), errors)
+            if errors:
+                raise _validation_error(self, errors)
+            for instance, to_many in many_to_many:
+                for name, value in to_many.items():
+                    getattr(instance, name).set(value)
+        return objs if many else objs[0]
+
+    def _save_batches(self, using, objs, indexes, batch_size, save, errors):
+        batch_size = batch_size or len(indexes) or 1
+        for start in range(0, len(indexes), batch_size):
+            batch = indexes[start:start + batch_size]
+            try:
+                with transaction.atomic(using=using):
+                    save([objs[idx] for idx in batch])
+                continue
+            except DatabaseError:
+                pass
+            # Find the failing items of the batch, saving them one at a time.
+            for idx in batch:
+                try:
+                    with transaction.atomic(using=using):
+                        save([objs[idx]])
+                except DatabaseError:
+                    errors[idx] = [ErrorDetail(self.error_messages['save_failed'],
+                                               code='save_failed')]
 
-class PartialDictField(DictField):
+    def iter_internal_value(self, items, max_errors=None):
+        """
+        Validate the given items as they are consumed, generating their internal values.
+
+        Values stop being generated at the first invalid item. Once max_errors (by default, the
+        field's max_errors) invalid items have been seen, or the items are exhausted, a
+        ValidationError is raised with the errors of the invalid items by index, as for lists.
+        """
+        if max_errors is None:
+            max_errors = self.max_errors
+        check = _native_value_check(self.item_field) if self.batch else None
+        if self.max_length is not None:
+            items = self._length_limited(items)
+        for _idx, value in _iter_validated(
+                self, _validation_child(self, self.item_field), enumerate(items), max_errors,
+                check):
+            yield value
+
+    def _columnar_internal_value(self, data):
+        serializer = self.item_field
+        fields = list(serializer._writable_fields)
+        names = list(OrderedDict.fromkeys(field.source_attrs[0] for field in fields))
+        columns = dict((name, []) for name in names)
+        errors = {}
+        by_field = _validates_by_field(serializer)
+        for idx, item in enumerate(data):
+            if not by_field or not isinstance(item, Mapping):
+                try:
+                    value = serializer.run_validation(item)
+                except ValidationError as e:
+                    errors[idx] = e.detail
+                    continue
+                except DjangoValidationError as e:
+                    errors[idx] = get_error_detail(e)
+                    continue
+                value = value if value is not None else {}
+                # Keys added by the serializer's own validation get a column too.
+                for name in value:
+                    if name not in columns:
+                        columns[name] = [None] * idx
+                for name, column in columns.items():
+                    column.append(value.get(name))
+                continue
+            item_errors = {}
+            for field in fields:
+                try:
+                    value = field.run_validation(field.get_value(item))
+                except ValidationError as e:
+                    item_errors[field.field_name] = e.detail
+                    continue
+                except DjangoValidationError as e:
+                    item_errors[field.field_name] = get_error_detail(e)
+                    continue
+                except SkipField:
+                    value = None
+                # Values are appended to the columns even once there are errors, as those are
+                # then raised rather than the columns returned.
+                columns[field.source].append(value)
+            if item_errors:
+                errors[idx] = item_errors
+        if errors:
+            raise _validation_error(self, errors)
+        fields_by_name = dict((field.source_attrs[0], field) for field in fields)
+        return dict(
+            (name, _column(fields_by_name.get(name), column)) for name, column in columns.items())
+
+    def _columnar_representation(self, obj):
+        result = {}
+        for field in self.item_field._readable_fields:
+            if isinstance(obj, Mapping):
+                if field.source not in obj:
+                    continue
+                attributes = obj[field.source]
+            else:
+                attributes = []
+                for instance in obj:
+                    try:
+                        attributes.append(field.get_attribute(instance))
+                    except SkipField:
+                        attributes.append(None)
+            result[field.field_name] = [
+                None if (value.pk if isinstance(value, PKOnlyObject) else value) is None
+                else field.to_representation(value)
+                for value in attributes
+            ]
+        return result
+
+    def expand_errors(self, detail):
+        """
+        Expand the sparse errors of the field (see sparse_errors) into its errors by index, or get
+        other errors as they are.
+        """
+        return _expand_sparse_errors(detail, _parse_indexes, lambda _idx: self.item_field)
+
+    def _structure_checks(self):
+        if self._item_structure_check is _missing:
+            check = _structure_check(self.item_field)
+            self._item_structure_check = check if check is not None else (lambda v: True)
+        return self._item_structure_check
+
+    def _unshare_child(self):
+        self.item_field = copy.deepcopy(self.item_field)
+        self.item_field.bind(field_name='', parent=self)
+
+    def _compilable(self):
+        return super(ListOrItemField, self)._compilable() and not (
+            self.columnar or self.iterative)
+
+    def _sync_only_validation(self):
+        return super(ListOrItemField, self)._sync_only_validation() or self.columnar
+
+    def _sync_only_representation(self):
+        return super(ListOrItemField, self)._sync_only_representation() or self.columnar
+
+    def _check_length(self, data):
+        if self.max_length is not None and len(data) > self.max_length:
+            self.fail('max_length', max_length=self.max_length)
+        _charge_items(len(data))
+
+    def _length_limited(self, items):
+        for idx, item in enumerate(items):
+            if idx == self.max_length:
+                self.fail('max_length', max_length=self.max_length)
+            yield item
+
+
+class PartialDictField(_CompiledMixin, _SharedChildMixin, _TotalItemsLimitMixin,
+                       _AsyncValidationMixin, DictField):
     """
     A dict field whose values are filtered to only include values for the specified keys.
+
+    The child may be a mapping of keys to the fields for their values. The keyword options
+    (included_patterns, max_keys, etc.) are described in the PartialDictField section of
+    docs/usage.rst.
     """
 
+    default_error_messages = {
+        'max_errors': _('Validation stopped after {max_errors} invalid values.'),
+        'max_keys': _('Ensure this field has no more than {max_keys} keys.'),
+        'max_total_items': _('Ensure this field has no more than {max_total_items} elements in '
+                             'total.'),
+    }
+
+    # Options, by their defaults, which are only set on fields they're given to (see _pop_options).
+    _options = ('batch', 'stream', 'memoize', 'max_errors', 'parallel_threshold',
+                'parallel_workers', 'max_concurrency', 'share_child', 'compiled', 'zero_copy',
+                'cache_fingerprint', 'representation_cache', 'max_keys', 'max_total_items',
+                'precheck', 'sparse_errors')
+    batch = False
+    stream = False
+    memoize = None
+    max_errors = None
+    parallel_threshold = None
+    parallel_workers = None
+    max_concurrency = 10
+    share_child = False
+    compiled = False
+    zero_copy = False
+    cache_fingerprint = None
+    representation_cache = None
+    max_keys = None
+    max_total_items = None
+    precheck = False
+    sparse_errors = False
+    _value_structure_checks = _missing
+
     def __init__(self, included_keys, child, *args, **kwargs):
-        self.included_keys = included_keys
-        super(PartialDictField, self).__init__(child=child, *args, **kwargs)
+        _pop_options(self, kwargs)
+        assert self.cache_fingerprint is None or not (self.stream or self.zero_copy), (
+            'The `stream` and `zero_copy` arguments are not supported with `cache_fingerprint`.'
+        )
+        # Keep the de-duplicated included keys, in declaration order, and precompute a hashed index
+        # of their positions, so filtering never scans the given included_keys container.
+        self.included_keys = tuple(OrderedDict.fromkeys(included_keys))
+        self._included_key_index = _key_positions(self.included_keys)
+        self.included_patterns = tuple(kwargs.pop('included_patterns', ()))
+        self._key_matcher = _key_matcher(self.included_patterns)
+        if not isinstance(child, Mapping):
+            self.child_fields = self._child_dispatch = None
+            super(PartialDictField, self).__init__(child=child, *args, **kwargs)
+            return
+        self.child_fields = OrderedDict(child)
+        self.included_keys = tuple(OrderedDict.fromkeys(self.included_keys + tuple(child)))
+        self._included_key_index = _key_positions(self.included_keys)
+        assert not (self.batch or self.memoize or self.stream or self.parallel_threshold or
+                    self.included_patterns), (
+            'The `batch`, `memoize`, `stream`, `parallel_threshold` and `included_patterns` '
+            'arguments are not supported with a mapping of `child` fields.'
+        )
+        assert all(key in self.child_fields for key in self.included_keys), (
+            'Every included key must have a field in the mapping of `child` fields.'
+        )
+        for field in self.child_fields.values():
+            assert not inspect.isclass(field), '`child` field has not been instantiated.'
+            assert field.source is None, (
+                "The `source` argument is not meaningful when applied to a `child=` field. "
+                "Remove `source=` from the field declaration."
+            )
+        super(PartialDictField, self).__init__(*args, **kwargs)
+        # Fields by the str keys of the internal values, for looking up each value's field.
+        self._child_dispatch = {}
+        for key, field in self.child_fields.items():
+            field.bind(field_name=str(key), parent=self)
+            self._child_dispatch[str(key)] = field
 
+    @instrumented
+    @_cached_representation
     def to_representation(self, obj):
-        return super(PartialDictField, self).to_representation(self._filter_dict(obj))
+        compiled = self._compiled()
+        if compiled is not None:
+            return compiled[1](obj)
+        if (self.zero_copy and isinstance(obj, dict) and
+                all(type(k) is str for k in obj) and self._includes_all_keys(obj) and
+                self._represented_unchanged(obj)):
+            return obj
+        value = self._filter_dict(obj)
+        if self.stream and isinstance(value, dict):
+            return StreamingDict(value, self.child.to_representation)
+        if (self.zero_copy and isinstance(value, dict) and
+                all(type(k) is str for k in value) and self._represented_unchanged(value)):
+            return value
+        if self._child_dispatch is not None:
+            dispatch = self._child_dispatch
+            return dict(
+                (str(k), dispatch[str(k)].to_representation(v) if v is not None else None)
+                for k, v in value.items()
+            )
+        return super(PartialDictField, self).to_representation(value)
 
+    @instrumented
     def to_internal_value(self, data):
+        compiled = self._compiled()
+        if compiled is not None:
+            return compiled[0](data)
+        self._check_keys(data)
         return super(PartialDictField, self).to_internal_value(self._filter_dict(data))
 
-    def _filter_dict(self, value):
-        if isinstance(value, dict):
+    async def ato_representation(self, obj):
+        if self._child_dispatch is not None or not _is_async_child(self.child):
+            return self.to_representation(obj)
+        if self._sync_only_representation():
+            return await sync_to_async(self.to_representation)(obj)
+        value = self._filter_dict(obj)
+        if not isinstance(value, dict):
+            return self.to_representation(obj)
+        return dict(
+            (str(k), v) for k, v in await _arepresented(self, self.child, list(value.items())))
+
+    async def ato_internal_value(self, data):
+        if self._child_dispatch is not None or not _is_async_child(self.child):
+            return self.to_internal_value(data)
+        if self._sync_only_validation():
+            return await sync_to_async(self.to_internal_value)(data)
+        self._check_keys(data)
+        data = self._filter_dict(data)
+        if not isinstance(data, dict):
+            self.fail('not_a_dict', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return dict(await _avalidated(
+            self, self.child, [(str(k), v) for k, v in data.items()], self.max_errors))
+
+    def _compile_internal_value(self):
+        run_validation = _compiled_run_validation(self.child)
+        dispatch = None
+        if self._child_dispatch is not None:
+            dispatch = dict(
+                (key, _compiled_run_validation(field))
+                for key, field in self._child_dispatch.items())
+        filter_dict = self._filter_dict
+        check_keys = self._check_keys
+        interpreted = super(PartialDictField, self).to_internal_value
+
+        def to_internal_value(data):
+            if not isinstance(data, dict):
+                # Leave HTML input and type errors to DictField.
+                return interpreted(filter_dict(data))
+            check_keys(data)
+            data = filter_dict(data)
+            if not self.allow_empty and len(data) == 0:
+                self.fail('empty')
+            result = {}
+            errors = {}
+            for key, value in data.items():
+                key = str(key)
+                try:
+                    if dispatch is not None:
+                        result[key] = dispatch[key](value)
+                        continue
+                    result[key] = run_validation(value)
+                except ValidationError as e:
+                    errors[key] = e.detail
+                except DjangoValidationError as e:
+                    errors[key] = get_error_detail(e)
+            if errors:
+                raise ValidationError(errors)
+            return result
+        return to_internal_value
+
+    def _compile_representation(self):
+        represent = _compiled_to_representation(self.child)
+        filter_dict = self._filter_dict
+        if self._child_dispatch is not None:
+            dispatch = dict(
+                (key, _compiled_to_representation(field))
+                for key, field in self._child_dispatch.items())
+
+            def to_representation(obj):
+                result = {}
+                for key, value in filter_dict(obj).items():
+                    key = str(key)
+                    result[key] = dispatch[key](value) if value is not None else None
+                return result
+            return to_representation
+
+        def to_representation(obj):
             return dict(
-                (k, v)
-                for k, v in value.items()
-                if k in self.included_keys
+                (str(key), represent(value) if value is not None else None)
+                for key, value in filter_dict(obj).items()
             )
+        return to_representation
+
+    def run_child_validation(self, data):
+        if self.precheck:
+            _validate_implausible(
+                self, self._child_dispatch if self._child_dispatch is not None else self.child,
+                [(str(k), v) for k, v in data.items()], self._structure_checks())
+        if self._child_dispatch is not None:
+            return dict(_iter_validated(
+                self, self._child_dispatch, ((str(k), v) for k, v in data.items()),
+                self.max_errors))
+        check = _native_value_check(self.child) if self.batch else None
+        if check is not None and all(map(check, data.values())):
+            return dict((str(k), v) for k, v in data.items())
+        if self.parallel_threshold is not None and len(data) >= self.parallel_threshold:
+            return dict(_parallel_validated(
+                self, self.child, [(str(k), v) for k, v in data.items()], self.max_errors,
+                self.parallel_workers))
+        return dict(_iter_validated(
+            self, _validation_child(self, self.child, data.values()),
+            ((str(k), v) for k, v in data.items()), self.max_errors, check))
+
+    def expand_errors(self, detail):
+        """
+        Expand the sparse errors of the field (see sparse_errors) into its errors by key, or get
+        other errors as they are.
+        """
+        dispatch = self._child_dispatch
+        return _expand_sparse_errors(
+            detail, lambda key: (key,),
+            lambda key: self.child if dispatch is None else dispatch.get(key))
+
+    def _structure_checks(self):
+        """
+        Get the structure check of values (or, for a mapping of child fields, the mapping of those
+        by str key), passing all values when a child field isn't checked.
+        """
+        if self._value_structure_checks is _missing:
+            if self._child_dispatch is None:
+                check = _structure_check(self.child)
+                checks = check if check is not None else (lambda v: True)
+            else:
+                checks = {}
+                for key, field in self._child_dispatch.items():
+                    check = _structure_check(field)
+                    checks[key] = check if check is not None else (lambda v: True)
+            self._value_structure_checks = checks
+        return self._value_structure_checks
+
+    def _unshare_child(self):
+        if self.child_fields is None:
+            self.child = copy.deepcopy(self.child)
+            self.child.bind(field_name='', parent=self)
+            return
+        self.child_fields = copy.deepcopy(self.child_fields)
+        self._child_dispatch = {}
+        for key, field in self.child_fields.items():
+            field.bind(field_name=str(key), parent=self)
+            self._child_dispatch[str(key)] = field
+
+    def _check_keys(self, data):
+        if not isinstance(data, dict):
+            return
+        if self.max_keys is not None and len(data) > self.max_keys:
+            self.fail('max_keys', max_keys=self.max_keys)
+        _charge_items(len(data))
+
+    def _represented_unchanged(self, value):
+        if self._child_dispatch is None:
+            return _represented_unchanged(self.child, value.values())
+        return all(_represented_unchanged(self._child_dispatch[k], (v,)) for k, v in value.items())
+
+    def _includes_all_keys(self, value):
+        if self._included_key_index.keys() >= value.keys():
+            return True
+        match = self._key_matcher
+        index = self._included_key_index
+        return match is not None and all(
+            k in index or (isinstance(k, str) and match(k)) for k in value)
+
+    def _filter_dict(self, value):
+        """
+        Filter the dict to its included items, keyed by its own keys, in the order of the included
+        keys, followed by the items included by included_patterns, in the order of the dict.
+        """
+        if isinstance(value, dict):
+            match = self._key_matcher
+            index = self._included_key_index
+            if match is None and len(index) < len(value):
+                # Fewer keys are included than given, so probe the input for each included key.
+                # Those are its own keys, unless they're equal keys of other types (e.g., 1 and
+                # True), which are left to scanning.
+                items = [(k, value[k]) for k in self.included_keys if k in value]
+                if all(type(k) is str for k, _v in items):
+                    return dict(items)
+            if match is None:
+                items = [(k, v) for k, v in value.items() if k in index]
+            else:
+                items = [
+                    (k, v) for k, v in value.items()
+                    if k in index or (isinstance(k, str) and match(k))
+                ]
+            # Sorting is linear when the dict is already in the order of the included keys.
+            last = len(index)
+            items.sort(key=lambda item: index.get(item[0], last))
+            return dict(items)
         return value
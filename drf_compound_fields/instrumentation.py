@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of the conversions of compound fields.
+
+When enabled, each to_internal_value and to_representation call of a compound field reports to a
+sink the field's path in its serializer (e.g., "details.*.tags"), the operation, and its metrics:
+the time taken, the number of items given, the number of errors (by item), and the number of keys
+filtered out (by a PartialDictField). When no sink is set and no collector is active, the only
+cost is checking for one.
+
+Set a process-wide sink with set_sink, or collect the records of a block of code (e.g., in tests)
+with collect::
+
+    from drf_compound_fields import instrumentation
+
+    instrumentation.set_sink(instrumentation.LoggingSink())
+
+    with instrumentation.collect() as collector:
+        serializer.is_valid()
+    print(collector.records)
+
+"""
+
+
+from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import logging
+import threading
+import time
+
+from rest_framework.serializers import ValidationError
+from rest_framework.settings import api_settings
+
+
+_sink = None
+_collector = ContextVar('drf_compound_fields_collector', default=None)
+
+
+def set_sink(sink):
+    """
+    Set the process-wide sink that records are reported to, or None to disable instrumentation.
+    """
+    global _sink
+    _sink = sink
+
+
+def get_sink():
+    """
+    Get the sink that records are currently reported to: the active collector, if any, or else the
+    process-wide sink.
+    """
+    return _collector.get() or _sink
+
+
+class LoggingSink(object):
+    """
+    Sink that logs each record.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger('drf_compound_fields')
+        self.level = level
+
+    def record(self, field_path, operation, metrics):
+        self.logger.log(self.level, '%s %s %r', field_path, operation, metrics)
+
+
+class AggregatingSink(object):
+    """
+    Sink that aggregates records in process, statsd-style: the call count and the totals of each
+    metric (plus the maximum time) by field path and operation.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def record(self, field_path, operation, metrics):
+        with self.lock:
+            stats = self.stats.get((field_path, operation))
+            if stats is None:
+                stats = self.stats[(field_path, operation)] = {
+                    'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'items': 0, 'errors': 0,
+                    'filtered_keys': 0,
+                }
+            stats['calls'] += 1
+            stats['max_seconds'] = max(stats['max_seconds'], metrics['seconds'])
+            for name in ('seconds', 'items', 'errors', 'filtered_keys'):
+                stats[name] += metrics[name]
+
+    def snapshot(self):
+        """
+        Get a copy of the aggregated stats, by (field path, operation).
+        """
+        with self.lock:
+            return dict((key, dict(stats)) for key, stats in self.stats.items())
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+
+class Collector(object):
+    """
+    Sink that keeps the list of (field path, operation, metrics) records.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, field_path, operation, metrics):
+        self.records.append((field_path, operation, metrics))
+
+
+@contextmanager
+def collect():
+    """
+    Collect the records of the enclosed block, in the current context only, instead of reporting
+    them to the process-wide sink.
+    """
+    collector = Collector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+def field_path(field):
+    """
+    Get the dotted path of the field's name in its serializers, with "*" for the children of
+    compound fields, or the field's class name if it is not bound.
+    """
+    names = []
+    while field.parent is not None:
+        names.append(field.field_name or '*')
+        field = field.parent
+    if not names:
+        return type(field).__name__
+    return '.'.join(reversed(names))
+
+
+def _count(value):
+    return len(value) if isinstance(value, (list, Mapping)) else 1
+
+
+def instrumented(method):
+    """
+    Decorate a conversion method of a compound field, to report it to the current sink.
+    """
+    @functools.wraps(method)
+    def wrapper(field, data):
+        sink = get_sink()
+        if sink is None:
+            return method(field, data)
+        metrics = {'seconds': 0.0, 'items': _count(data), 'errors': 0, 'filtered_keys': 0}
+        start = time.perf_counter()
+        try:
+            result = method(field, data)
+        except ValidationError as e:
+            # Sparse errors (see fields.sparse_errors) are counted by the keys they stand for.
+            detail = field.expand_errors(e.detail)
+            if isinstance(detail, Mapping):
+                metrics['errors'] = len(
+                    [key for key in detail if key != api_settings.NON_FIELD_ERRORS_KEY])
+            else:
+                metrics['errors'] = 1
+            raise
+        else:
+            return result
+        finally:
+            metrics['seconds'] = time.perf_counter() - start
+            filter_dict = getattr(field, '_filter_dict', None)
+            if filter_dict is not None and isinstance(data, dict):
+                # The keys a PartialDictField filters out, counted apart from the conversion.
+                metrics['filtered_keys'] = len(data) - len(filter_dict(data))
+            sink.record(field_path(field), method.__name__, metrics)
+    return wrapper
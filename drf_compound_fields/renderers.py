@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Renderers for writing the representations of compound fields incrementally.
+
+"""
+
+
+from collections.abc import Mapping
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from .fields import StreamingList
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    A JSON renderer that can produce its output as an iterator of byte chunks, converting the
+    items of StreamingList and StreamingDict representations only as they are written.
+
+    A DRF Response renders its data with render, which joins the chunks, so memory is then bounded
+    by the size of the whole payload. To bound it by chunk_size instead, return the
+    StreamingHttpResponse of streaming_json_response.
+    """
+
+    chunk_size = 64 * 1024
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.iter_render(data, accepted_media_type, renderer_context))
+
+    def iter_render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render data into JSON, yielding bytestrings of about chunk_size bytes.
+        """
+        if data is None:
+            return
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            # Pretty printing is left to the plain renderer.
+            yield super(StreamingJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+            return
+
+        item_separator, key_separator = (',', ':') if self.compact else (', ', ': ')
+        # The separators also apply to the containers that the encoder's default() converts values
+        # into (e.g., sets into tuples).
+        encoder = self.encoder_class(
+            ensure_ascii=self.ensure_ascii, allow_nan=not self.strict,
+            separators=(item_separator, key_separator))
+        buffer = []
+        size = 0
+        for text in self._iter_encode(data, encoder.encode, item_separator, key_separator):
+            buffer.append(text)
+            size += len(text)
+            if size >= self.chunk_size:
+                yield self._encode_chunk(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield self._encode_chunk(buffer)
+
+    def _iter_encode(self, obj, encode, item_separator, key_separator):
+        if isinstance(obj, (list, tuple, StreamingList)):
+            yield '['
+            separator = ''
+            for item in obj:
+                yield separator
+                separator = item_separator
+                for text in self._iter_encode(item, encode, item_separator, key_separator):
+                    yield text
+            yield ']'
+        elif isinstance(obj, Mapping):
+            yield '{'
+            separator = ''
+            for key, value in obj.items():
+                yield separator
+                separator = item_separator
+                yield encode(_json_key(key, encode))
+                yield key_separator
+                for text in self._iter_encode(value, encode, item_separator, key_separator):
+                    yield text
+            yield '}'
+        else:
+            yield encode(obj)
+
+    def _encode_chunk(self, buffer):
+        # As JSONRenderer, fully escape \u2028 and \u2029 to output a strict javascript subset.
+        chunk = ''.join(buffer)
+        return chunk.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+def _json_key(key, encode):
+    """
+    Convert the dict key into the str it's written as, the same way as json does.
+    """
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (int, float)):
+        # e.g., 'null', 'true' and '1.5', as the values would be written.
+        return encode(key)
+    raise TypeError('keys must be str, int, float, bool or None, not {0}'.format(
+        type(key).__name__))
+
+
+def streaming_json_response(data, status=200, renderer=None):
+    """
+    Get a StreamingHttpResponse of the data rendered into JSON chunks with the renderer (by
+    default, a StreamingJSONRenderer), so that memory is bounded by its chunk_size.
+    """
+    renderer = renderer or StreamingJSONRenderer()
+    return StreamingHttpResponse(
+        renderer.iter_render(data), status=status, content_type=renderer.media_type)
@@ -14,11 +14,24 @@ and validation.
 
 from . import test_settings
 
+import multiprocessing
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+import pytest
 
+from drf_compound_fields import fields
+from drf_compound_fields import instrumentation
 from drf_compound_fields.fields import DictField
 from drf_compound_fields.fields import ListField
 from drf_compound_fields.fields import ListOrItemField
+from drf_compound_fields.fields import PartialDictField
+from drf_compound_fields.fields import StreamingList
 
 
 class ListSerializer(serializers.Serializer):
@@ -118,3 +131,360 @@ def test_list_or_item_kwargs():
     assert serializer.is_valid(), 'Optional list-or-item should allow empty list: {0}'.format(
         serializer.errors
     )
+
+
+class ParallelContainerSerializer(serializers.Serializer):
+    embedded = ListOrItemField(child=EmbeddedSerializer(), parallel_threshold=2,
+                               parallel_workers=2)
+    emails = PartialDictField(['a', 'b', 'c'], child=serializers.EmailField(), required=False,
+                              parallel_threshold=2, parallel_workers=2)
+
+
+def test_parallel_valid():
+    data = {
+        'embedded': [{'value': 'a{0}@example.com'.format(i)} for i in range(20)],
+        'emails': {'a': 'a@example.com', 'b': 'b@example.com', 'd': 'notAnEmail'},
+    }
+    serializer = ParallelContainerSerializer(data=data)
+    assert serializer.is_valid(), serializer.errors
+    assert data['embedded'] == serializer.validated_data['embedded']
+    assert {'a': 'a@example.com', 'b': 'b@example.com'} == serializer.validated_data['emails']
+
+
+def test_parallel_errors_match_sequential():
+    data = {
+        'embedded': [{'value': 'a@example.com' if i % 3 else 'notAnEmail'} for i in range(20)],
+        'emails': {'a': 'a@example.com', 'b': 'notAnEmail', 'c': 'notAnEmail'},
+    }
+    serializer = ParallelContainerSerializer(data=data)
+    assert not serializer.is_valid()
+    sequential = ContainerSerializer(data=data)
+    assert not sequential.is_valid()
+    assert sequential.errors['embedded'] == serializer.errors['embedded']
+    assert list(sequential.errors['embedded']) == list(serializer.errors['embedded'])
+    assert {'b', 'c'} == set(serializer.errors['emails'])
+
+
+def test_parallel_max_errors_match_sequential():
+    data = [{'value': 'notAnEmail'} for i in range(20)]
+    errors = []
+    for parallel_threshold in (None, 2):
+        field = ListOrItemField(child=EmbeddedSerializer(), max_errors=3,
+                                parallel_threshold=parallel_threshold, parallel_workers=2)
+        try:
+            field.to_internal_value(data)
+        except serializers.ValidationError as e:
+            errors.append(e.detail)
+    assert errors[0] == errors[1]
+    assert 4 == len(errors[1])
+
+
+def test_parallel_unpicklable_children():
+    """
+    Item fields that can't be pickled are validated sequentially with the same results.
+    """
+    class LocalSerializer(serializers.Serializer):
+        value = serializers.EmailField()
+
+    def odd(value):
+        if value % 2 == 0:
+            raise serializers.ValidationError('Even.')
+
+    children = [
+        lambda: LocalSerializer(),
+        lambda: serializers.IntegerField(validators=[lambda value: odd(value)]),
+    ]
+    data = [
+        [{'value': 'a@example.com' if i % 3 else 'notAnEmail'} for i in range(10)],
+        list(range(10)),
+    ]
+    for child, items in zip(children, data):
+        errors = []
+        for parallel_threshold in (None, 2):
+            field = ListOrItemField(child=child(), parallel_threshold=parallel_threshold,
+                                    parallel_workers=2)
+            with pytest.raises(serializers.ValidationError) as excinfo:
+                field.to_internal_value(items)
+            errors.append(excinfo.value.detail)
+        assert errors[0] == errors[1]
+        assert field._parallel_child_pickle is None
+
+
+def test_parallel_start_method():
+    """
+    Parallel validation forks its workers whatever the default start method, and is sequential
+    where processes can't be forked.
+    """
+    data = {'embedded': [{'value': 'a{0}@example.com'.format(i)} for i in range(20)]}
+    start_method = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method('forkserver', force=True)
+    process_pools = fields._process_pools
+    fields._process_pools = {}
+    try:
+        serializer = ParallelContainerSerializer(data=data)
+        assert serializer.is_valid(), serializer.errors
+    finally:
+        multiprocessing.set_start_method(start_method, force=True)
+        for pool in fields._process_pools.values():
+            pool.shutdown()
+        fields._process_pools = process_pools
+    get_all_start_methods = multiprocessing.get_all_start_methods
+    multiprocessing.get_all_start_methods = lambda: ['spawn']
+    try:
+        serializer = ParallelContainerSerializer(data=data)
+        assert serializer.is_valid(), serializer.errors
+        assert not hasattr(serializer.fields['embedded'], '_parallel_child_pickle')
+    finally:
+        multiprocessing.get_all_start_methods = get_all_start_methods
+
+
+@pytest.fixture(scope='module')
+def groups():
+    call_command('migrate', verbosity=0)
+    return [Group.objects.create(name='group{0}'.format(i)) for i in range(5)]
+
+
+def test_batch_related_list(groups):
+    pks = [g.pk for g in groups]
+    field = ListOrItemField(child=serializers.PrimaryKeyRelatedField(queryset=Group.objects.all()),
+                            batch=True)
+    with CaptureQueriesContext(connection) as queries:
+        value = field.to_internal_value(pks[::-1] + [str(pks[0]), pks[0]])
+    assert groups[::-1] + [groups[0], groups[0]] == value
+    assert 1 == len(queries)
+
+
+def test_ato_internal_value_related(groups):
+    """
+    Related item fields are run in the thread that holds the database connection.
+    """
+    pks = [g.pk for g in groups]
+    field = ListOrItemField(child=serializers.PrimaryKeyRelatedField(queryset=Group.objects.all()))
+    assert groups == async_to_sync(field.ato_internal_value)(pks)
+    field = PartialDictField(['a', 'b'], child=serializers.PrimaryKeyRelatedField(
+        queryset=Group.objects.all()))
+    assert {'a': groups[0], 'b': groups[1]} == async_to_sync(field.ato_internal_value)(
+        {'a': pks[0], 'b': pks[1], 'c': 999})
+    with pytest.raises(serializers.ValidationError) as e:
+        async_to_sync(field.ato_internal_value)({'a': 999, 'b': pks[1]})
+    assert ['a'] == list(e.value.detail)
+
+
+def test_parallel_database_children():
+    """
+    Item fields that may query the database, anywhere in their tree, are validated sequentially.
+    """
+    class GroupListSerializer(serializers.Serializer):
+        groups = ListOrItemField(child=GroupSerializer())
+
+    children = [
+        GroupSerializer(),
+        ListOrItemField(child=serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())),
+        GroupListSerializer(),
+        serializers.CharField(validators=[UniqueValidator(queryset=Group.objects.all())]),
+    ]
+    for child in children:
+        field = ListOrItemField(child=child, parallel_threshold=2, parallel_workers=2)
+        with pytest.raises(serializers.ValidationError):
+            field.to_internal_value([None, None])
+        assert field._parallel_child_pickle is None
+
+
+def test_ato_sync_only_options(groups):
+    """
+    The async conversions apply the options only the sync conversions do.
+    """
+    pks = [g.pk for g in groups] * 4
+    field = ListOrItemField(child=serializers.PrimaryKeyRelatedField(queryset=Group.objects.all()),
+                            batch=True, stream=True)
+    with CaptureQueriesContext(connection) as queries:
+        assert groups * 4 == async_to_sync(field.ato_internal_value)(pks)
+    assert 1 == len(queries)
+    representation = async_to_sync(field.ato_representation)(groups)
+    assert isinstance(representation, StreamingList)
+    assert [g.pk for g in groups] == list(representation)
+    field = PartialDictField(['a', 'b'], child=serializers.PrimaryKeyRelatedField(
+        queryset=Group.objects.all()), batch=True)
+    with CaptureQueriesContext(connection) as queries:
+        assert {'a': groups[0], 'b': groups[1]} == async_to_sync(field.ato_internal_value)(
+            {'a': pks[0], 'b': pks[1]})
+    assert 1 == len(queries)
+
+
+def test_batch_related_errors_match_per_item(groups):
+    data = [groups[0].pk, 999, 'x', True, None, groups[1].pk, {}, 999, 2 ** 70, '2' * 30]
+    errors = []
+    for batch in (False, True):
+        field = ListOrItemField(
+            child=serializers.PrimaryKeyRelatedField(queryset=Group.objects.all()), batch=batch)
+        with pytest.raises(serializers.ValidationError) as e:
+            field.to_internal_value(data)
+        errors.append(e.value.detail)
+    assert errors[0] == errors[1]
+
+
+def test_batch_related_dict(groups):
+    field = PartialDictField(
+        ['a', 'b'], child=serializers.PrimaryKeyRelatedField(queryset=Group.objects.all()),
+        batch=True)
+    with CaptureQueriesContext(connection) as queries:
+        value = field.to_internal_value({'a': groups[0].pk, 'b': groups[1].pk, 'c': 999})
+    assert {'a': groups[0], 'b': groups[1]} == value
+    assert 1 == len(queries)
+
+
+class SharedChildSerializer(serializers.Serializer):
+    embedded = ListOrItemField(child=EmbeddedSerializer(), share_child=True)
+    emails = PartialDictField(['a'], child=serializers.EmailField(), required=False,
+                              share_child=True)
+
+
+def test_shared_child():
+    first = SharedChildSerializer(data={'embedded': {'value': 'a@example.com'}})
+    second = SharedChildSerializer(data={'embedded': [{'value': 'notAnEmail'}],
+                                         'emails': {'a': 'a@example.com'}})
+    assert first.fields['embedded'] is not second.fields['embedded']
+    assert first.fields['embedded'].item_field is second.fields['embedded'].item_field
+    assert first.fields['emails'].child is second.fields['emails'].child
+    assert 'embedded' == second.fields['embedded'].field_name
+    assert second.fields['embedded'].parent is second
+    assert first.is_valid(), first.errors
+    assert not second.is_valid()
+    assert ['embedded'] == list(second.errors)
+
+
+class PairSerializer(serializers.Serializer):
+    value = serializers.EmailField()
+    other = serializers.EmailField()
+
+
+class SharedPairSerializer(serializers.Serializer):
+    pairs = ListOrItemField(child=PairSerializer(), share_child=True)
+    named = PartialDictField(['a'], child={'a': PairSerializer()}, required=False,
+                             share_child=True)
+
+
+def test_shared_child_partial():
+    """
+    Under a partial serializer, nested fields skip missing values, as with unshared children.
+    """
+    data = {'pairs': [{'value': 'a@example.com'}], 'named': {'a': {'other': 'b@example.com'}}}
+    serializer = SharedPairSerializer(data=data, partial=True)
+    assert serializer.is_valid(), serializer.errors
+    assert data == serializer.validated_data
+    assert (SharedPairSerializer().fields['pairs'].item_field is not
+            serializer.fields['pairs'].item_field)
+    serializer = SharedPairSerializer(data=data)
+    assert not serializer.is_valid()
+    assert {'pairs', 'named'} == set(serializer.errors)
+
+
+def test_unshared_child():
+    first = ContainerSerializer(data={'embedded': {'value': 'a@example.com'}})
+    second = ContainerSerializer(data={'embedded': {'value': 'a@example.com'}})
+    assert first.fields['embedded'].item_field is not second.fields['embedded'].item_field
+
+
+def _nested_field(compiled):
+    return PartialDictField(['a', 'b', 'c'], child=ListOrItemField(
+        child=PartialDictField(['x'], child=ListOrItemField(child=EmbeddedSerializer())),
+        allow_null=True), compiled=compiled)
+
+
+def _convert(method, value):
+    try:
+        return method(value)
+    except serializers.ValidationError as e:
+        return e.detail
+
+
+@pytest.mark.parametrize('data', [
+    {'a': [{'x': {'value': 'a@example.com'}, 'y': 1}], 'b': {'x': []}, 'c': None, 'd': 1},
+    {'a': [{'x': {'value': 'notAnEmail'}}, {'x': [{}]}, 'notADict'], 'b': {'x': None}},
+    {'a': {'x': [{'value': 'a@example.com'}, {'value': 'notAnEmail'}]}},
+    'notADict',
+])
+def test_compiled_internal_value_matches_interpreted(data):
+    expected = _convert(_nested_field(False).to_internal_value, data)
+    compiled_field = _nested_field(True)
+    assert expected == _convert(compiled_field.to_internal_value, data)
+    assert compiled_field._compiled_converters is not None
+
+
+def test_compiled_representation_matches_interpreted():
+    obj = {'a': [{'x': {'value': 'a@example.com'}, 'y': 1}, None], 'b': {'x': []}, 'c': None}
+    assert _nested_field(False).to_representation(obj) == \
+        _nested_field(True).to_representation(obj)
+
+
+def test_compiled_not_used_with_options():
+    field = ListOrItemField(child=serializers.IntegerField(), compiled=True, batch=True)
+    assert [1] == field.to_internal_value([1])
+    assert field._compiled_converters is None
+
+
+def test_compiled_not_used_when_instrumented():
+    field = _nested_field(True)
+    with instrumentation.collect() as collector:
+        field.to_internal_value({'a': [{'x': []}]})
+    assert field._compiled_converters is None
+    assert 4 == len(collector.records)
+
+
+class LimitedSerializer(serializers.Serializer):
+    tags = PartialDictField(['a', 'b'], child=ListOrItemField(child=serializers.CharField()),
+                            max_total_items=5)
+
+
+def test_max_total_items_nested():
+    """
+    The max_total_items limit of a compound field should count the elements of its nested compound
+    fields, and be reported as an error of that field.
+    """
+    serializer = LimitedSerializer(data={'tags': {'a': ['x', 'y'], 'b': ['z']}})
+    assert serializer.is_valid()
+    serializer = LimitedSerializer(data={'tags': {'a': ['x', 'y'], 'b': ['z', 'w']}})
+    assert not serializer.is_valid()
+    assert 'max_total_items' == serializer.errors['tags'][0].code
+
+
+class GroupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Group
+        fields = ['name']
+
+
+def test_bulk_save(groups):
+    field = ListOrItemField(child=GroupSerializer())
+    value = field.to_internal_value([{'name': 'bulk{0}'.format(i)} for i in range(5)])
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            saved = field.bulk_save(value, batch_size=2)
+        assert ['bulk{0}'.format(i) for i in range(5)] == [g.name for g in saved]
+        assert all(g.pk is not None for g in saved)
+        assert 3 == len([q for q in queries if q['sql'].startswith('INSERT')])
+        renamed = field.bulk_save([{'name': 'bulk0-renamed'}, {'name': 'bulk5'}],
+                                  instances=[saved[0], None])
+        assert saved[0] is renamed[0]
+        assert 'bulk0-renamed' == Group.objects.get(pk=saved[0].pk).name
+        assert Group.objects.filter(name='bulk5').exists()
+    finally:
+        Group.objects.filter(name__startswith='bulk').delete()
+
+
+def test_bulk_save_errors(groups):
+    field = ListOrItemField(child=GroupSerializer())
+    data = [{'name': 'bulk0'}, {'name': groups[0].name}, {'name': 'bulk1'}, {'name': 'bulk0'}]
+    with pytest.raises(serializers.ValidationError) as e:
+        field.bulk_save(data, batch_size=2)
+    assert {1, 3} == set(e.value.detail)
+    assert 'save_failed' == e.value.detail[1][0].code
+    assert not Group.objects.filter(name__startswith='bulk').exists()
+
+
+def test_bulk_save_instances_mismatch(groups):
+    field = ListOrItemField(child=GroupSerializer())
+    with pytest.raises(AssertionError):
+        field.bulk_save([{'name': 'bulk0'}, {'name': 'bulk1'}], instances=[groups[0]])
+    assert groups[0].name == Group.objects.get(pk=groups[0].pk).name
+    assert not Group.objects.filter(name__startswith='bulk').exists()
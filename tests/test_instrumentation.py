@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+test_instrumentation
+--------------------
+
+Tests for `drf_compound_fields.instrumentation`.
+
+"""
+
+
+from . import test_settings
+
+import logging
+
+from rest_framework import serializers
+
+from drf_compound_fields import instrumentation
+from drf_compound_fields.fields import ListOrItemField
+from drf_compound_fields.fields import PartialDictField
+
+
+class InstrumentedSerializer(serializers.Serializer):
+    tags = ListOrItemField(child=serializers.CharField(max_length=5))
+    details = PartialDictField(['a', 'b'], child=ListOrItemField(child=serializers.IntegerField()))
+
+
+def test_collect():
+    """
+    Within collect, the conversions of compound fields should be recorded by field path, with their
+    metrics.
+    """
+    serializer = InstrumentedSerializer(data={
+        'tags': ['a', '123456', '123456'],
+        'details': {'a': [1, 2], 'c': 3, 'd': 4},
+    })
+    with instrumentation.collect() as collector:
+        serializer.is_valid()
+    records = dict(((path, operation), metrics)
+                   for path, operation, metrics in collector.records)
+    assert set([
+        ('tags', 'to_internal_value'),
+        ('details', 'to_internal_value'),
+        ('details.*', 'to_internal_value'),
+    ]) == set(records)
+    assert 3 == records[('tags', 'to_internal_value')]['items']
+    assert 2 == records[('tags', 'to_internal_value')]['errors']
+    assert 2 == records[('details', 'to_internal_value')]['filtered_keys']
+    assert 2 == records[('details.*', 'to_internal_value')]['items']
+    assert all(metrics['seconds'] >= 0 for metrics in records.values())
+
+
+class DefaultedSerializer(serializers.Serializer):
+    a = serializers.CharField()
+    b = serializers.CharField(default='b')
+
+
+def test_collect_counts():
+    """
+    Filtered keys should only be those a PartialDictField filters out, and sparse errors should be
+    counted by the items they stand for.
+    """
+    with instrumentation.collect() as collector:
+        ListOrItemField(child=DefaultedSerializer()).to_internal_value({'a': '1', 'c': '2'})
+        PartialDictField(['a'], child=serializers.CharField()).to_representation(
+            {'a': '1', 'b': '2'})
+        try:
+            ListOrItemField(child=serializers.IntegerField(), sparse_errors=True).to_internal_value(
+                ['a', 'b', 1, 'c'])
+        except serializers.ValidationError:
+            pass
+    assert [0, 1, 0] == [metrics['filtered_keys'] for _path, _op, metrics in collector.records]
+    assert 3 == collector.records[2][2]['errors']
+
+
+def test_disabled():
+    """
+    Outside of collect, and without a sink, nothing should be recorded.
+    """
+    with instrumentation.collect() as collector:
+        pass
+    ListOrItemField(child=serializers.CharField()).to_internal_value(['a'])
+    assert [] == collector.records
+    assert instrumentation.get_sink() is None
+
+
+def test_aggregating_sink():
+    """
+    The AggregatingSink should aggregate the metrics of calls by field path and operation.
+    """
+    sink = instrumentation.AggregatingSink()
+    instrumentation.set_sink(sink)
+    try:
+        field = ListOrItemField(child=serializers.CharField())
+        field.to_internal_value(['a', 'b'])
+        field.to_internal_value('a')
+        field.to_representation(['a'])
+    finally:
+        instrumentation.set_sink(None)
+    stats = sink.snapshot()
+    assert 2 == stats[('ListOrItemField', 'to_internal_value')]['calls']
+    assert 3 == stats[('ListOrItemField', 'to_internal_value')]['items']
+    assert 1 == stats[('ListOrItemField', 'to_representation')]['calls']
+    sink.reset()
+    assert {} == sink.snapshot()
+
+
+def test_logging_sink(caplog):
+    """
+    The LoggingSink should log each record.
+    """
+    instrumentation.set_sink(instrumentation.LoggingSink())
+    try:
+        with caplog.at_level(logging.DEBUG, logger='drf_compound_fields'):
+            PartialDictField(['a'], child=serializers.CharField()).to_representation({'a': 1})
+    finally:
+        instrumentation.set_sink(None)
+    assert ['PartialDictField to_representation'] == [
+        ' '.join(r.getMessage().split(' ')[:2]) for r in caplog.records]
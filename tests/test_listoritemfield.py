@@ -13,16 +13,27 @@ Tests for `drf_compound_fields.fields.ListOrItemField`.
 
 from . import test_settings
 
+from array import array
+import asyncio
+import copy
 from datetime import date
+import tracemalloc
 
 from rest_framework.serializers import ValidationError
 from rest_framework import ISO_8601
+from rest_framework.serializers import BooleanField
 from rest_framework.serializers import CharField
 from rest_framework.serializers import DateField
+from rest_framework.serializers import FloatField
+from rest_framework.serializers import Field
+from rest_framework.serializers import IntegerField
+from rest_framework.serializers import ListField
 from rest_framework.serializers import Serializer
 import pytest
 
 from drf_compound_fields.fields import ListOrItemField
+from drf_compound_fields.fields import RepresentationCache
+from drf_compound_fields.fields import SPARSE_ERRORS_KEY
 
 
 def test_to_representation_list():
@@ -91,3 +102,605 @@ def test_list_value_invalid_items():
     field = ListOrItemField(child=CharField(max_length=5))
     with pytest.raises(ValidationError):
         field.to_internal_value(['12345', '123456'])
+
+
+class CountingCharField(CharField):
+    """
+    A CharField that counts how many times its conversion methods are invoked.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CountingCharField, self).__init__(*args, **kwargs)
+        self.calls = {'run_validation': 0, 'to_internal_value': 0}
+
+    def run_validation(self, *args, **kwargs):
+        self.calls['run_validation'] += 1
+        return super(CountingCharField, self).run_validation(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        self.calls['to_internal_value'] += 1
+        return super(CountingCharField, self).to_internal_value(data)
+
+
+def test_item_converted_once():
+    """
+    When given an item, the ListOrItemField should run the item field's validation pipeline exactly
+    once.
+    """
+    child = CountingCharField(max_length=5)
+    field = ListOrItemField(child=child)
+    assert 'abc' == field.to_internal_value('abc')
+    assert {'run_validation': 1, 'to_internal_value': 1} == child.calls
+
+
+def test_list_items_converted_once():
+    """
+    When given a list, the ListOrItemField should run the item field's validation pipeline exactly
+    once per element.
+    """
+    child = CountingCharField(max_length=5)
+    field = ListOrItemField(child=child)
+    assert ['a', 'b', 'c'] == field.to_internal_value(['a', 'b', 'c'])
+    assert {'run_validation': 3, 'to_internal_value': 3} == child.calls
+
+
+class ValidatedSerializer(Serializer):
+    name = CharField()
+
+    def validate(self, attrs):
+        attrs['validated'] = True
+        return attrs
+
+
+def test_item_serializer_validate_result():
+    """
+    When given an item for a serializer item field, the ListOrItemField should return the result of
+    the serializer's validate method.
+    """
+    field = ListOrItemField(child=ValidatedSerializer())
+    assert {'name': 'a', 'validated': True} == field.to_internal_value({'name': 'a'})
+
+
+@pytest.mark.parametrize('child_class,data', [
+    (IntegerField, [1, -2, 3, 2 ** 70]),
+    (IntegerField, [1, '2', 3.0, True, 'x', None]),
+    (FloatField, [1.5, 2.0, float('nan')]),
+    (FloatField, [1.5, '2.5', 3, 'x']),
+    (BooleanField, [True, False, 'true', 0, 'x']),
+])
+def test_batch_list_matches_elementwise(child_class, data):
+    """
+    When batch is enabled, the ListOrItemField should produce the same values and the same
+    per-index errors as element-wise validation.
+    """
+    def convert(field):
+        try:
+            return field.to_internal_value(data)
+        except ValidationError as e:
+            return e.detail
+
+    expected = convert(ListOrItemField(child=child_class()))
+    actual = convert(ListOrItemField(child=child_class(), batch=True))
+    assert expected == actual
+    assert [type(v) for v in expected] == [type(v) for v in actual]
+
+
+def test_batch_native_list_skips_child():
+    """
+    When batch is enabled and all list values are of the child's native type, the child's
+    validation should not be invoked per element.
+    """
+    field = ListOrItemField(child=IntegerField(), batch=True)
+    calls = []
+    run_validation = field.item_field.run_validation
+    field.item_field.run_validation = lambda *args: calls.append(args) or run_validation(*args)
+    data = list(range(1000))
+    assert data == field.to_internal_value(data)
+    assert [] == calls
+    assert [1, 2] == field.to_internal_value([1, '2'])
+    assert [('2',)] == calls
+
+
+def test_batch_respects_child_validators():
+    """
+    When batch is enabled, the child field's validators should still be applied.
+    """
+    field = ListOrItemField(child=IntegerField(max_value=5), batch=True)
+    with pytest.raises(ValidationError):
+        field.to_internal_value([1, 2, 6])
+    with pytest.raises(ValidationError):
+        field.to_internal_value(6)
+
+
+def test_batch_item():
+    """
+    When batch is enabled, a single native item should be returned as-is, and others should be
+    converted by the item field.
+    """
+    field = ListOrItemField(child=IntegerField(), batch=True)
+    assert 5 == field.to_internal_value(5)
+    assert 5 == field.to_internal_value('5')
+    with pytest.raises(ValidationError):
+        field.to_internal_value(True)
+
+
+def test_stream_to_representation_list():
+    """
+    When stream is enabled, the ListOrItemField to_representation method should return a lazy
+    list of the item field's representations.
+    """
+    field = ListOrItemField(child=DateField(format=ISO_8601), stream=True)
+    data = field.to_representation([date(2000, 1, 1), None])
+    assert 2 == len(data)
+    assert ['2000-01-01', None] == list(data)
+    assert '2000-01-01' == field.to_representation(date(2000, 1, 1))
+
+
+def test_iterative_to_internal_value():
+    """
+    When iterative is enabled, the ListOrItemField to_internal_value method should validate an
+    iterator of items as they are consumed.
+    """
+    consumed = []
+
+    def items():
+        for item in [date(2000, 1, 1).isoformat(), date(2000, 1, 2).isoformat()]:
+            consumed.append(item)
+            yield item
+
+    field = ListOrItemField(child=DateField(format=ISO_8601), iterative=True)
+    values = field.to_internal_value(items())
+    assert [] == consumed
+    assert date(2000, 1, 1) == next(values)
+    assert 1 == len(consumed)
+    assert [date(2000, 1, 2)] == list(values)
+
+
+def test_iter_internal_value_errors():
+    """
+    The ListOrItemField iter_internal_value method should stop generating values at the first
+    invalid item, and report the errors of all invalid items by index.
+    """
+    field = ListOrItemField(child=CharField(max_length=5))
+    values = field.iter_internal_value(iter(['a', 'b', '123456', 'c', '123456']))
+    assert ['a', 'b'] == [next(values), next(values)]
+    with pytest.raises(ValidationError) as e:
+        next(values)
+    assert [2, 4] == sorted(e.value.detail)
+
+
+def test_iter_internal_value_max_errors():
+    """
+    The ListOrItemField iter_internal_value method should stop consuming items once max_errors
+    invalid items have been seen.
+    """
+    field = ListOrItemField(child=CharField(max_length=5))
+    items = iter(['123456', 'a', '123456', '123456', 'b'])
+    with pytest.raises(ValidationError) as e:
+        list(field.iter_internal_value(items, max_errors=2))
+    assert {0, 2, 'non_field_errors'} == set(e.value.detail)
+    assert ['123456', 'b'] == list(items)
+
+
+def test_max_errors_list():
+    """
+    When max_errors is given, the ListOrItemField should stop validating a list once that many
+    items are invalid, and report a summary along with the errors found.
+    """
+    field = ListOrItemField(child=CharField(max_length=5), max_errors=2)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(['123456'] * 10)
+    assert {0, 1, 'non_field_errors'} == set(e.value.detail)
+    assert ['max_errors'] == [d.code for d in e.value.detail['non_field_errors']]
+
+
+def test_max_errors_not_reached():
+    """
+    When fewer items than max_errors are invalid, the ListOrItemField should report the errors of
+    all invalid items without a summary.
+    """
+    field = ListOrItemField(child=CharField(max_length=5), max_errors=3)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(['123456', 'a', '123456'])
+    assert {0, 2} == set(e.value.detail)
+
+
+def test_fail_fast():
+    """
+    When fail_fast is enabled, the ListOrItemField should stop validating a list at the first
+    invalid item.
+    """
+    field = ListOrItemField(child=CharField(max_length=5), fail_fast=True, max_errors=5)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(['a', '123456', '123456'])
+    assert {1, 'non_field_errors'} == set(e.value.detail)
+
+
+class AsyncCharField(CharField):
+    """
+    A CharField with async conversions, that tracks how many of them run concurrently.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncCharField, self).__init__(*args, **kwargs)
+        self.running = 0
+        self.max_running = 0
+
+    async def _track(self, method, value):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.001)
+        self.running -= 1
+        return method(value)
+
+    async def arun_validation(self, data):
+        return await self._track(self.run_validation, data)
+
+    async def ato_representation(self, value):
+        return await self._track(self.to_representation, value)
+
+
+def test_ato_internal_value_list():
+    """
+    The ListOrItemField ato_internal_value method should convert list items with an async item
+    field concurrently, up to max_concurrency at a time.
+    """
+    field = ListOrItemField(child=AsyncCharField(max_length=5), max_concurrency=3)
+    data = [str(i) for i in range(10)]
+    assert data == asyncio.run(field.ato_internal_value(data))
+    assert 3 == field.item_field.max_running
+
+
+def test_ato_internal_value_errors():
+    """
+    The ListOrItemField ato_internal_value method should report errors by index, as for lists.
+    """
+    field = ListOrItemField(child=AsyncCharField(max_length=5))
+    with pytest.raises(ValidationError) as e:
+        asyncio.run(field.ato_internal_value(['a', '123456', 'b', '123456']))
+    with pytest.raises(ValidationError) as expected:
+        ListOrItemField(child=CharField(max_length=5)).to_internal_value(
+            ['a', '123456', 'b', '123456'])
+    assert expected.value.detail == e.value.detail
+
+
+def test_arun_validation_item():
+    """
+    The ListOrItemField arun_validation method should validate an item with an async item field.
+    """
+    field = ListOrItemField(child=AsyncCharField(max_length=5))
+    assert 'a' == asyncio.run(field.arun_validation('a'))
+    with pytest.raises(ValidationError):
+        asyncio.run(field.arun_validation(None))
+
+
+def test_ato_representation():
+    """
+    The ListOrItemField ato_representation method should represent lists and items with an async
+    item field.
+    """
+    field = ListOrItemField(child=AsyncCharField())
+    assert ['1', None, '2'] == asyncio.run(field.ato_representation([1, None, 2]))
+    assert '1' == asyncio.run(field.ato_representation(1))
+
+
+def test_async_sync_child():
+    """
+    The ListOrItemField async methods should use the sync path for an item field without I/O.
+    """
+    field = ListOrItemField(child=DateField(format=ISO_8601))
+    assert [date(2000, 1, 1)] == asyncio.run(field.ato_internal_value(['2000-01-01']))
+    assert ['2000-01-01'] == asyncio.run(field.ato_representation([date(2000, 1, 1)]))
+
+
+def test_memoize_list():
+    """
+    When memoize is given, the ListOrItemField should validate each distinct list item once, and
+    produce the same values and errors as without it.
+    """
+    data = ['a', 'b', 'a', '123456', 'a', '123456', 1, True, 'b']
+    results = []
+    for memoize in (None, 2):
+        child = CountingCharField(max_length=5)
+        field = ListOrItemField(child=child, memoize=memoize)
+        with pytest.raises(ValidationError) as e:
+            field.to_internal_value(data)
+        results.append((e.value.detail, child.calls['run_validation']))
+    assert results[0][0] == results[1][0]
+    assert 9 == results[0][1]
+    # 'b' is evicted by the time it repeats at the end.
+    assert 6 == results[1][1]
+
+
+def test_memoize_unhashable_items():
+    """
+    When memoize is given, the ListOrItemField should validate unhashable list items every time.
+    """
+    field = ListOrItemField(child=ValidatedSerializer(), memoize=10)
+    value = field.to_internal_value([{'name': 'a'}, {'name': 'a'}])
+    assert [{'name': 'a', 'validated': True}] * 2 == value
+    assert value[0] is not value[1]
+
+
+def _bytes_per_instance(factory, count=200):
+    tracemalloc.start()
+    try:
+        instances = [factory() for _ in range(count)]
+        size, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == len(instances)
+    return size / count
+
+
+def test_memory_per_instance():
+    """
+    A ListOrItemField should take less memory than its former layout of a field holding both a
+    ListField and its item field, since it holds only one child field graph.
+    """
+    list_or_item_size = _bytes_per_instance(lambda: ListOrItemField(child=CharField()))
+    two_graph_size = _bytes_per_instance(lambda: (Field(), ListField(child=CharField())))
+    assert list_or_item_size < two_graph_size
+
+
+def test_zero_copy_to_representation():
+    """
+    When zero_copy is enabled, the ListOrItemField to_representation method should return a list
+    of items represented as themselves, and only such a list, without copying it.
+    """
+    field = ListOrItemField(child=CharField(), zero_copy=True)
+    obj = ['a', None, 'b']
+    assert obj is field.to_representation(obj)
+    obj = ['a', 1]
+    data = field.to_representation(obj)
+    assert ['a', '1'] == data
+    assert obj is not data
+    assert 'a' == field.to_representation('a')
+    date_field = ListOrItemField(child=DateField(format=ISO_8601), zero_copy=True)
+    obj = [date(2000, 1, 1)]
+    assert ['2000-01-01'] == date_field.to_representation(obj)
+
+
+def test_max_length():
+    """
+    When max_length is given, the ListOrItemField should reject longer lists before validating any
+    of their items.
+    """
+    field = ListOrItemField(child=CharField(max_length=5), max_length=2)
+    calls = []
+    run_validation = field.item_field.run_validation
+    field.item_field.run_validation = lambda *args: calls.append(args) or run_validation(*args)
+    assert ['a', 'b'] == field.to_internal_value(['a', 'b'])
+    calls[:] = []
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(['a', 'b', 'c'])
+    assert 'max_length' == e.value.detail[0].code
+    assert [] == calls
+
+
+def test_max_length_iterative():
+    """
+    When max_length is given, the ListOrItemField should reject iterator values once they exceed
+    it.
+    """
+    field = ListOrItemField(child=CharField(), iterative=True, max_length=2)
+    values = field.to_internal_value(iter(['a', 'b', 'c']))
+    assert 'a' == next(values)
+    assert 'b' == next(values)
+    with pytest.raises(ValidationError) as e:
+        next(values)
+    assert 'max_length' == e.value.detail[0].code
+
+
+def test_max_total_items():
+    """
+    When max_total_items is given, the ListOrItemField should reject values whose nested lists have
+    more elements in total, and accept those within the limit.
+    """
+    field = ListOrItemField(child=ListOrItemField(child=IntegerField()), max_total_items=6)
+    assert [[1, 2], [3, 4]] == field.run_validation([[1, 2], [3, 4]])
+    with pytest.raises(ValidationError) as e:
+        field.run_validation([[1, 2], [3, 4], [5, 6]])
+    assert 'max_total_items' == e.value.detail[0].code
+    with pytest.raises(ValidationError) as e:
+        field.run_validation([[1, 2], 'a'])
+    assert [1] == list(e.value.detail)
+
+
+class RowSerializer(Serializer):
+    name = CharField()
+    count = IntegerField()
+    ratio = FloatField(required=False)
+
+
+def test_columnar_to_internal_value():
+    """
+    When columnar is enabled, the ListOrItemField to_internal_value method should validate a list
+    of objects into columns, with arrays for integer and float fields.
+    """
+    field = ListOrItemField(child=RowSerializer(), columnar=True)
+    value = field.to_internal_value([
+        {'name': 'a', 'count': '1', 'ratio': 0.5},
+        {'name': 'b', 'count': 2},
+    ])
+    assert {'name': ['a', 'b'], 'count': array('q', [1, 2]), 'ratio': [0.5, None]} == value
+    assert {'name': 'a', 'count': 1} == field.to_internal_value({'name': 'a', 'count': 1})
+
+
+def test_columnar_errors_match_rows():
+    """
+    When columnar is enabled, the ListOrItemField should report the same errors as for a list of
+    objects.
+    """
+    data = [{'name': 'a', 'count': 'x'}, 'notAnObject', {'name': 'b', 'count': 1}, {}]
+    with pytest.raises(ValidationError) as columnar:
+        ListOrItemField(child=RowSerializer(), columnar=True).to_internal_value(data)
+    with pytest.raises(ValidationError) as rows:
+        ListOrItemField(child=RowSerializer()).to_internal_value(data)
+    assert rows.value.detail == columnar.value.detail
+
+
+def test_columnar_validated_serializer():
+    """
+    When columnar is enabled with a serializer that validates more than its fields, the
+    ListOrItemField should still validate each object with the serializer.
+    """
+    field = ListOrItemField(child=ValidatedSerializer(), columnar=True)
+    assert {'name': ['a', 'b'], 'validated': [True, True]} == field.to_internal_value(
+        [{'name': 'a'}, {'name': 'b'}])
+
+
+def test_columnar_converting_serializer():
+    """
+    When columnar is enabled with a serializer that converts its input, the ListOrItemField should
+    validate each object with the serializer, as for a list of objects.
+    """
+    class RenamingSerializer(Serializer):
+        name = CharField()
+
+        def to_internal_value(self, data):
+            if isinstance(data, dict) and 'title' in data:
+                data = dict(data, name=data['title'])
+            return super(RenamingSerializer, self).to_internal_value(data)
+
+    field = ListOrItemField(child=RenamingSerializer(), columnar=True)
+    assert {'name': ['a', 'b']} == field.to_internal_value([{'title': 'a'}, {'name': 'b'}])
+
+
+def test_columnar_to_representation():
+    """
+    When columnar is enabled, the ListOrItemField to_representation method should represent
+    columns, or a list of objects, as columns.
+    """
+    field = ListOrItemField(child=RowSerializer(), columnar=True)
+    columns = {'name': ['a', 'b'], 'count': array('q', [1, 2]), 'ratio': [0.5, None]}
+    expected = {'name': ['a', 'b'], 'count': [1, 2], 'ratio': [0.5, None]}
+    assert expected == field.to_representation(columns)
+    rows = [{'name': 'a', 'count': 1, 'ratio': 0.5}, {'name': 'b', 'count': 2, 'ratio': None}]
+    assert expected == field.to_representation(rows)
+
+
+def test_columnar_sources():
+    """
+    The ListOrItemField should reject columnar with serializer fields that have `*` or dotted
+    sources, which don't name a single column.
+    """
+    class StarSerializer(Serializer):
+        name = CharField()
+        row = RowSerializer(source='*')
+
+    class DottedSerializer(Serializer):
+        name = CharField(source='names.first')
+
+    for child in (StarSerializer(), DottedSerializer()):
+        with pytest.raises(AssertionError):
+            ListOrItemField(child=child, columnar=True)
+        ListOrItemField(child=child)
+
+
+def test_representation_cache():
+    """
+    When cache_fingerprint is given, the ListOrItemField should cache its representations, shared
+    by copies of the field.
+    """
+    cache = RepresentationCache()
+    field = ListOrItemField(child=CharField(), cache_fingerprint=lambda obj: tuple(obj),
+                            representation_cache=cache)
+    assert ['a', 'b'] == field.to_representation(['a', 'b'])
+    assert ['a', 'b'] == copy.deepcopy(field).to_representation(['a', 'b'])
+    assert ['c', 'd'] == field.to_representation(['c', 'd'])
+    assert (1, 2) == (cache.hits, cache.misses)
+
+
+def _local_field_class():
+    class CharField(Field):
+        def to_representation(self, value):
+            return value.upper()
+    return CharField
+
+
+def test_representation_cache_key():
+    """
+    The RepresentationCache should key representations by the qualified class names of the field
+    and its child, and by stable descriptions of their arguments, rather than by their reprs.
+    """
+    cache = RepresentationCache()
+    fields = [ListOrItemField(child=CharField()), ListOrItemField(child=_local_field_class()()),
+              ListOrItemField(child=CharField(max_length=1)),
+              ListOrItemField(child=CharField(validators=[lambda value: None])),
+              ListOrItemField(child=CharField(validators=[lambda value: None]))]
+    keys = [cache.key(field, ('a',)) for field in fields]
+    assert len(set(keys)) == len(keys)
+    assert keys[0] == cache.key(ListOrItemField(child=CharField()), ('a',))
+    assert keys[3] == cache.key(copy.deepcopy(fields[3]), ('a',))
+    assert ' at 0x' not in fields[3]._representation_config
+
+
+def test_precheck():
+    """
+    When precheck is enabled, the ListOrItemField should only validate the list items failing the
+    structure check, when some do, reporting the same errors for those as without it.
+    """
+    field = ListOrItemField(child=RowSerializer(), precheck=True)
+    calls = []
+    run_validation = field.item_field.run_validation
+    field.item_field.run_validation = lambda *args: calls.append(args) or run_validation(*args)
+    data = [{'name': 'a', 'count': 1}, {'name': 'b'}, 'notAnObject', {'name': ['c'], 'count': 1},
+            {'name': 'd', 'count': '1', 'ratio': '0.5'}]
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(data)
+    assert data[1:4] == [call[0] for call in calls]
+    with pytest.raises(ValidationError) as expected:
+        ListOrItemField(child=RowSerializer()).to_internal_value(data)
+    assert expected.value.detail == e.value.detail
+    calls[:] = []
+    assert [{'name': 'a', 'count': 1}] == field.to_internal_value([{'name': 'a', 'count': '1'}])
+    assert 1 == len(calls)
+
+
+def test_precheck_plausible_invalid():
+    """
+    When precheck is enabled, the ListOrItemField should still report errors of list items that
+    pass the structure check.
+    """
+    field = ListOrItemField(child=IntegerField(max_value=10), precheck=True)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value([1, 11, '2'])
+    assert [1] == list(e.value.detail)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value([1, 11, True, None])
+    assert [2, 3] == list(e.value.detail)
+
+
+def test_sparse_errors():
+    """
+    When sparse_errors is enabled, the ListOrItemField should report the errors of list items with
+    the indexes of items with equal errors grouped, and expand_errors should expand those into the
+    errors by index.
+    """
+    field = ListOrItemField(child=IntegerField(max_value=10), sparse_errors=True)
+    data = ['a', 'b', 'c', 1, 11, 'd', 12]
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(data)
+    groups = e.value.detail[SPARSE_ERRORS_KEY]
+    assert ['0-2,5', '4,6'] == list(groups)
+    assert {SPARSE_ERRORS_KEY: {'0-2,5': ['invalid'], '4,6': ['max_value']}} == (
+        e.value.get_codes())
+    with pytest.raises(ValidationError) as expected:
+        ListOrItemField(child=IntegerField(max_value=10)).to_internal_value(data)
+    assert expected.value.detail == field.expand_errors(e.value.detail)
+
+
+def test_sparse_errors_nested():
+    """
+    The expand_errors method should expand the sparse errors of nested compound fields.
+    """
+    field = ListOrItemField(child=ListOrItemField(child=IntegerField(), sparse_errors=True),
+                            sparse_errors=True)
+    data = [['a', 1], ['b', 2], [1]]
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(data)
+    assert ['0-1'] == list(e.value.detail[SPARSE_ERRORS_KEY])
+    with pytest.raises(ValidationError) as expected:
+        ListOrItemField(child=ListOrItemField(child=IntegerField())).to_internal_value(data)
+    assert expected.value.detail == field.expand_errors(e.value.detail)
@@ -13,14 +13,25 @@ Tests for `drf_compound_fields.fields.PartialDictField`.
 
 from . import test_settings
 
+import asyncio
+import copy
+import pickle
+import re
 from datetime import date
 
 from rest_framework.serializers import ValidationError
 from rest_framework import ISO_8601
 from rest_framework.serializers import CharField
 from rest_framework.serializers import DateField
+from rest_framework.serializers import IntegerField
+from rest_framework.serializers import PrimaryKeyRelatedField
+from rest_framework.serializers import StringRelatedField
+
+import pytest
 
 from drf_compound_fields.fields import PartialDictField
+from drf_compound_fields.fields import RepresentationCache
+from drf_compound_fields.fields import SPARSE_ERRORS_KEY
 
 
 def test_to_internal_value_with_included_keys():
@@ -81,3 +92,330 @@ def test_validate_non_included_keys():
         field.to_internal_value(data)
     except ValidationError:
         assert False, 'Got a ValidationError for a non-included key'
+
+
+class UnscannableDict(dict):
+    """
+    A dict that fails the test if all of its items are walked.
+    """
+
+    def items(self):
+        assert False, 'The whole input dict was scanned'
+
+
+def test_wide_dict_probes_included_keys():
+    """
+    When a PartialDictField is given a dict with more keys than it includes, it should look up the
+    included keys instead of scanning the whole input dict.
+    """
+    field = PartialDictField(included_keys=('k1', 'k3', 'missing'), child=CharField())
+    data = UnscannableDict(('k{0}'.format(i), str(i)) for i in range(5000))
+    assert {'k1': '1', 'k3': '3'} == field.to_internal_value(data)
+
+
+def test_narrow_dict_scans_input():
+    """
+    When a PartialDictField is given a dict with fewer keys than it includes, it should return the
+    same included values by scanning the input dict.
+    """
+    field = PartialDictField(included_keys=['k{0}'.format(i) for i in range(100)],
+                             child=CharField())
+    data = {'k1': '1', 'k3': '3', 'other': 'x'}
+    assert {'k1': '1', 'k3': '3'} == field.to_internal_value(data)
+
+
+def test_filtered_keys_consistent():
+    """
+    Whether a PartialDictField probes or scans its input, it should filter it to the input's own
+    keys, in the order of the included keys.
+    """
+    field = PartialDictField(included_keys=['b', 'a', 'c'], child=CharField())
+    assert ['b', 'a'] == list(field._filter_dict({'a': '1', 'b': '2'}))
+    assert ['b', 'a'] == list(field._filter_dict({'a': '1', 'x': '2', 'y': '3', 'b': '4'}))
+    field = PartialDictField(included_keys=[1], child=CharField())
+    for value in ({True: 'x'}, {True: 'x', 'y': 'y'}):
+        (key,) = field._filter_dict(value)
+        assert key is True
+
+
+def test_duplicate_included_keys():
+    """
+    When a PartialDictField has duplicate included_keys, each included value should be returned
+    once.
+    """
+    field = PartialDictField(included_keys=['a', 'a', 'a'], child=CharField())
+    assert {'a': 'x'} == field.to_internal_value({'a': 'x', 'b': 'y'})
+
+
+def test_batch_matches_elementwise():
+    """
+    When batch is enabled, a PartialDictField should produce the same values and errors as
+    element-wise validation.
+    """
+    for data in ({'a': 1, 'b': 2, 'c': 'x'}, {'a': 1, 'b': '2'}, {'a': 1, 'b': 2}):
+        results = []
+        for batch in (False, True):
+            field = PartialDictField(included_keys=['a', 'b'], child=IntegerField(), batch=batch)
+            try:
+                results.append(field.to_internal_value(data))
+            except ValidationError as e:
+                results.append(e.detail)
+        assert results[0] == results[1]
+
+
+def test_stream_to_representation():
+    """
+    When stream is enabled, the PartialDictField to_representation method should return a lazy
+    mapping of the value-field's representations of the included values.
+    """
+    field = PartialDictField(included_keys=['a', 'c'], child=DateField(format=ISO_8601),
+                             stream=True)
+    data = field.to_representation({"a": date(2000, 1, 1), "b": date(2000, 1, 2), "c": None})
+    assert {"a": "2000-01-01", "c": None} == dict(data)
+    assert [("a", "2000-01-01"), ("c", None)] == list(data.items())
+
+
+def test_max_errors():
+    """
+    When max_errors is given, the PartialDictField should stop validating once that many included
+    values are invalid, and report a summary along with the errors found.
+    """
+    field = PartialDictField(included_keys=['a', 'b', 'c'], child=CharField(max_length=5),
+                             max_errors=2)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value({'a': '123456', 'b': '123456', 'c': '123456', 'd': '123456'})
+    assert 3 == len(e.value.detail)
+    assert ['max_errors'] == [d.code for d in e.value.detail['non_field_errors']]
+
+
+def test_ato_internal_value():
+    """
+    The PartialDictField ato_internal_value method should convert included values with a related
+    value-field with sync_to_async, and report errors by key.
+    """
+    class Queryset(object):
+        def get(self, pk):
+            return 'object {0}'.format(pk)
+
+    field = PartialDictField(included_keys=['a', 'b'],
+                             child=PrimaryKeyRelatedField(queryset=Queryset()))
+    data = {'a': 1, 'b': 2, 'c': 3}
+    assert {'a': 'object 1', 'b': 'object 2'} == asyncio.run(field.ato_internal_value(data))
+    with pytest.raises(ValidationError) as e:
+        asyncio.run(field.ato_internal_value({'a': True, 'b': 2}))
+    assert ['a'] == list(e.value.detail)
+    with pytest.raises(ValidationError):
+        asyncio.run(field.ato_internal_value('notADict'))
+
+
+def test_ato_representation():
+    """
+    The PartialDictField ato_representation method should represent included values with a related
+    value-field.
+    """
+    field = PartialDictField(included_keys=['a'], child=StringRelatedField())
+    assert {'a': 'x'} == asyncio.run(field.ato_representation({'a': 'x', 'b': 'y'}))
+
+
+def test_memoize():
+    """
+    When memoize is given, the PartialDictField should validate each distinct value once.
+    """
+    field = PartialDictField(included_keys=['a', 'b', 'c'], child=DateField(), memoize=10)
+    calls = []
+    run_validation = field.child.run_validation
+    field.child.run_validation = lambda *args: calls.append(args) or run_validation(*args)
+    data = {'a': '2000-01-01', 'b': '2000-01-01', 'c': '2000-01-02'}
+    obj = field.to_internal_value(data)
+    assert {'a': date(2000, 1, 1), 'b': date(2000, 1, 1), 'c': date(2000, 1, 2)} == obj
+    assert 2 == len(calls)
+
+
+def test_zero_copy_to_representation():
+    """
+    When zero_copy is enabled, the PartialDictField to_representation method should return a dict
+    of only included keys and values represented as themselves, or else the filtered dict.
+    """
+    field = PartialDictField(included_keys=['a', 'b'], child=CharField(), zero_copy=True)
+    obj = {'a': 'x', 'b': None}
+    data = field.to_representation(obj)
+    assert obj is data
+    assert obj == copy.deepcopy(data)
+    assert obj == pickle.loads(pickle.dumps(data))
+    assert {'a': 'x'} == field.to_representation({'a': 'x', 'c': 'z'})
+    obj = {'a': 1}
+    data = field.to_representation(obj)
+    assert {'a': '1'} == data
+    data['a'] = 'y'
+    assert 1 == obj['a']
+
+
+def test_included_patterns():
+    """
+    The PartialDictField should also include values for keys matching any of its included_patterns,
+    whether prefix globs, other globs or regular expressions.
+    """
+    field = PartialDictField(
+        included_keys=['a'], child=IntegerField(),
+        included_patterns=['metric.*', 'x?', re.compile('attr_[0-9]+'), re.compile('Y', re.I)])
+    data = {
+        'a': 1, 'b': 2, 'metric.cpu': 3, 'metrics': 4, 'x1': 5, 'x12': 6, 'attr_12': 7,
+        'attr_1x': 8, 'y': 9, 1: 10,
+    }
+    included = {'a': 1, 'metric.cpu': 3, 'x1': 5, 'attr_12': 7, 'y': 9}
+    assert included == field.to_internal_value(data)
+    assert included == field.to_representation(data)
+
+
+def test_included_patterns_only():
+    """
+    The PartialDictField should filter by its included_patterns alone when no keys are included.
+    """
+    field = PartialDictField(included_keys=[], child=CharField(), included_patterns=['k1*'])
+    assert {'k1': 'a', 'k10': 'b'} == field.to_internal_value({'k1': 'a', 'k10': 'b', 'k2': 'c'})
+
+
+def test_included_patterns_groups_and_flags():
+    """
+    The PartialDictField should match regular expressions with groups, or flags that can't be
+    combined, on their own.
+    """
+    patterns = [re.compile('(?P<n>a)b'), re.compile('(?P<n>c)d'), re.compile('(a)b'),
+                re.compile(r'(x)\1'), re.compile(r'\w+_', re.ASCII), 'k*']
+    field = PartialDictField(included_keys=[], child=CharField(), included_patterns=patterns)
+    data = {'ab': '1', 'cd': '2', 'xx': '3', 'e_': '4', '\u00e9_': '5', 'k1': '6', 'z': '7'}
+    assert ['ab', 'cd', 'xx', 'e_', 'k1'] == list(field.to_internal_value(data))
+
+
+def test_child_fields():
+    """
+    Given a mapping of child fields, the PartialDictField should include their keys and convert
+    each value with the field for its key.
+    """
+    field = PartialDictField(included_keys=[], child={'a': IntegerField(), 'b': DateField()})
+    data = {'a': '1', 'b': '2000-01-01', 'c': 'x'}
+    assert {'a': 1, 'b': date(2000, 1, 1)} == field.to_internal_value(data)
+    assert {'a': 1, 'b': '2000-01-01'} == field.to_representation(
+        {'a': 1, 'b': date(2000, 1, 1), 'c': 'x'})
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value({'a': '2000-01-01', 'b': '1'})
+    assert {'a', 'b'} == set(e.value.detail)
+    assert 'b' == field.child_fields['b'].field_name
+
+
+def test_child_fields_compiled():
+    """
+    Given a mapping of child fields, a compiled PartialDictField should convert each value with the
+    field for its key.
+    """
+    field = PartialDictField(included_keys=[], child={'a': IntegerField(), 'b': DateField()},
+                             compiled=True)
+    data = {'a': '1', 'b': '2000-01-01', 'c': 'x'}
+    assert {'a': 1, 'b': date(2000, 1, 1)} == field.to_internal_value(data)
+    assert {'a': 1, 'b': '2000-01-01'} == field.to_representation(
+        {'a': 1, 'b': date(2000, 1, 1), 'c': 'x'})
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value({'a': '2000-01-01'})
+    assert ['a'] == list(e.value.detail)
+
+
+def test_child_fields_missing_key():
+    """
+    Given a mapping of child fields, the PartialDictField should require a field for every included
+    key.
+    """
+    with pytest.raises(AssertionError):
+        PartialDictField(included_keys=['a', 'b'], child={'a': IntegerField()})
+
+
+def test_max_keys():
+    """
+    When max_keys is given, the PartialDictField should reject dicts of more keys, included or not.
+    """
+    field = PartialDictField(included_keys=['a'], child=CharField(), max_keys=2)
+    assert {'a': 'x'} == field.to_internal_value({'a': 'x', 'b': 'y'})
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value({'a': 'x', 'b': 'y', 'c': 'z'})
+    assert 'max_keys' == e.value.detail[0].code
+
+
+def _row_fingerprint(obj):
+    # Identifies the row, and its version, that a value comes from.
+    return (obj['id'], obj['version']) if 'version' in obj else None
+
+
+def test_representation_cache():
+    """
+    When cache_fingerprint is given, the PartialDictField should cache its representations by the
+    fingerprint of the value and its declaration.
+    """
+    cache = RepresentationCache()
+    field = PartialDictField(included_keys=['a'], child=DateField(format=ISO_8601),
+                             cache_fingerprint=_row_fingerprint, representation_cache=cache)
+    obj = {'a': date(2000, 1, 1), 'id': 1, 'version': 1}
+    assert {'a': '2000-01-01'} == field.to_representation(obj)
+    obj['a'] = date(2000, 1, 2)
+    assert {'a': '2000-01-01'} == field.to_representation(obj)
+    assert (1, 1) == (cache.hits, cache.misses)
+    assert {'a': '2000-01-03'} == field.to_representation(
+        {'a': date(2000, 1, 3), 'id': 2, 'version': 1})
+    assert (1, 2) == (cache.hits, cache.misses)
+    obj['version'] = 2
+    assert {'a': '2000-01-02'} == field.to_representation(obj)
+    assert {'a': '2000-01-02'} == field.to_representation({'a': date(2000, 1, 2)})
+    assert (1, 3) == (cache.hits, cache.misses)
+    other = PartialDictField(included_keys=['a', 'b'], child=DateField(format=ISO_8601),
+                             cache_fingerprint=_row_fingerprint, representation_cache=cache)
+    assert {'a': '2000-01-02', 'b': None} == other.to_representation(
+        {'a': date(2000, 1, 2), 'b': None, 'id': 1, 'version': 2})
+    assert (1, 4) == (cache.hits, cache.misses)
+
+
+def test_representation_cache_eviction():
+    """
+    The representation cache should keep at most its max_entries representations.
+    """
+    cache = RepresentationCache(max_entries=3)
+    field = PartialDictField(included_keys=['a'], child=CharField(),
+                             cache_fingerprint=lambda obj: obj['a'], representation_cache=cache)
+    for value in ('x', 'y', 'z', 'x', 'w', 'y', 'x'):
+        field.to_representation({'a': value})
+    assert (2, 5) == (cache.hits, cache.misses)
+
+
+def test_precheck():
+    """
+    When precheck is enabled, the PartialDictField should only validate the included values
+    failing the structure check, when some do.
+    """
+    field = PartialDictField(included_keys=['a', 'b', 'c'], child=IntegerField(max_value=10),
+                             precheck=True)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value({'a': 11, 'b': [1], 'd': True})
+    assert ['b'] == list(e.value.detail)
+    assert {'a': 1, 'c': 2} == field.to_internal_value({'a': 1, 'c': '2', 'd': True})
+    dispatch_field = PartialDictField(included_keys=[], child={'a': IntegerField(),
+                                                               'b': CharField()}, precheck=True)
+    with pytest.raises(ValidationError) as e:
+        dispatch_field.to_internal_value({'a': '1', 'b': {}})
+    assert ['b'] == list(e.value.detail)
+
+
+def test_sparse_errors():
+    """
+    When sparse_errors is enabled, the PartialDictField should report the errors of values with
+    the keys of values with equal errors grouped, which expand_errors should expand.
+    """
+    field = PartialDictField(included_keys=['a', 'b', 'c'], child=IntegerField(), max_errors=2,
+                             sparse_errors=True)
+    data = {'a': 'x', 'b': 'y', 'c': 'z'}
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value(data)
+    assert ['a,b'] == list(e.value.detail[SPARSE_ERRORS_KEY])
+    assert {'a', 'b', 'non_field_errors'} == set(field.expand_errors(e.value.detail))
+    field = PartialDictField(included_keys=['a,b', 'c\\'], child=IntegerField(),
+                             sparse_errors=True)
+    with pytest.raises(ValidationError) as e:
+        field.to_internal_value({'a,b': 'x', 'c\\': 'y'})
+    assert {SPARSE_ERRORS_KEY: {'a\\,b,c\\\\': ['invalid']}} == e.value.get_codes()
+    assert {'a,b', 'c\\'} == set(field.expand_errors(e.value.detail))
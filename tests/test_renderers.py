@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+test_renderers
+--------------
+
+Tests for `drf_compound_fields.renderers`.
+
+"""
+
+
+from . import test_settings
+
+from datetime import date
+import json
+
+from rest_framework import ISO_8601
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from drf_compound_fields.fields import ListOrItemField
+from drf_compound_fields.fields import PartialDictField
+from drf_compound_fields.renderers import StreamingJSONRenderer
+from drf_compound_fields.renderers import streaming_json_response
+
+
+class StreamingSerializer(serializers.Serializer):
+    dates = ListOrItemField(child=serializers.DateField(format=ISO_8601), stream=True)
+    details = PartialDictField(['a', 'b'], child=serializers.CharField(), stream=True)
+
+
+def test_render_streamed_values():
+    """
+    The StreamingJSONRenderer should render streamed compound-field values the same as the plain
+    JSONRenderer renders non-streamed values.
+    """
+    data = StreamingSerializer({
+        'dates': [date(2000, 1, 1), None, date(2000, 1, 2)],
+        'details': {'a': 1, 'b': u'\u2028', 'c': 3},
+    }).data
+    expected = {'dates': ['2000-01-01', None, '2000-01-02'], 'details': {'a': '1', 'b': u'\u2028'}}
+    rendered = StreamingJSONRenderer().render(data)
+    assert expected == json.loads(rendered.decode())
+    assert b'\\u2028' in rendered
+
+
+def test_render_streamed_values_with_plain_renderer():
+    """
+    The plain JSONRenderer should still be able to render streamed compound-field values.
+    """
+    data = StreamingSerializer({'dates': [date(2000, 1, 1)], 'details': {'a': 1, 'c': 3}}).data
+    expected = {'dates': ['2000-01-01'], 'details': {'a': '1'}}
+    assert expected == json.loads(JSONRenderer().render(data).decode())
+
+
+def test_iter_render_chunks():
+    """
+    The StreamingJSONRenderer iter_render method should yield chunks of about chunk_size bytes,
+    converting items only as they are written.
+    """
+    converted = []
+
+    class TrackingField(serializers.IntegerField):
+        def to_representation(self, value):
+            converted.append(value)
+            return super(TrackingField, self).to_representation(value)
+
+    field = ListOrItemField(child=TrackingField(), stream=True)
+    renderer = StreamingJSONRenderer()
+    renderer.chunk_size = 100
+    chunks = renderer.iter_render({'values': field.to_representation(list(range(1000)))})
+    next(chunks)
+    assert len(converted) < 100
+    rendered = next(chunks) and b''.join(chunks)
+    assert 1000 == len(converted)
+    assert rendered.endswith(b']}')
+
+
+def test_iter_render_indent():
+    """
+    When indenting, the StreamingJSONRenderer should render as the plain JSONRenderer does.
+    """
+    data = {'a': [1, 2]}
+    renderer_context = {'indent': 2}
+    assert (JSONRenderer().render(data, renderer_context=renderer_context) ==
+            StreamingJSONRenderer().render(data, renderer_context=renderer_context))
+
+
+def test_render_keys():
+    """
+    The StreamingJSONRenderer should write non-str keys as the plain JSONRenderer does.
+    """
+    data = {None: 1, True: 2, False: 3, 2: 4, 1.5: 5, 'a': {None: 6}}
+    assert JSONRenderer().render(data) == StreamingJSONRenderer().render(data)
+
+
+def test_render_converted_containers():
+    """
+    The StreamingJSONRenderer should write the containers that the encoder converts values into
+    with the same separators as the plain JSONRenderer does.
+    """
+    data = {'ids': {1, 2}, 'nested': [frozenset(['a', 'b']), {'ids': {3, 4}}]}
+    for compact in (True, False):
+        plain = JSONRenderer()
+        streaming = StreamingJSONRenderer()
+        plain.compact = streaming.compact = compact
+        assert plain.render(data) == streaming.render(data)
+
+
+def test_streaming_json_response():
+    """
+    The streaming_json_response function should stream the rendered chunks of the data.
+    """
+    converted = []
+
+    class TrackingField(serializers.IntegerField):
+        def to_representation(self, value):
+            converted.append(value)
+            return super(TrackingField, self).to_representation(value)
+
+    field = ListOrItemField(child=TrackingField(), stream=True)
+    renderer = StreamingJSONRenderer()
+    renderer.chunk_size = 100
+    response = streaming_json_response(
+        {'values': field.to_representation(list(range(1000)))}, status=201, renderer=renderer)
+    assert 201 == response.status_code
+    assert 'application/json' == response['Content-Type']
+    chunks = iter(response)
+    rendered = next(chunks)
+    assert len(converted) < 100
+    rendered += b''.join(chunks)
+    assert {'values': list(range(1000))} == json.loads(rendered.decode())
@@ -10,7 +10,16 @@ settings.configure(
     DEBUG=True,
     TEMPLATE_DEBUG=True,
     SECRET_KEY='s3cr3t',
-    # INSTALLED_APPS=[],
+    INSTALLED_APPS=[
+        'django.contrib.contenttypes',
+        'django.contrib.auth',
+    ],
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        },
+    },
 )
 
 